@@ -88,6 +88,7 @@ class Config:
     BARRIER_ROAD_TYPES: list[str] = [
         "motorway", "motorway_link", "trunk", "trunk_link"
     ]
+    MIN_ZONE_AREA: float = 0.00001  # Drop polygonized slivers below this area (square degrees)
     
     # =========================================================================
     # OSRM Routing
@@ -104,6 +105,7 @@ class Config:
     # Output Paths
     # =========================================================================
     OUTPUT_DIR: str = "maps"
+    COMPRESS_MAPS: bool = False  # Write maps as .html.gz (serve with Content-Encoding: gzip)
     
     # =========================================================================
     # Database Settings
@@ -14,7 +14,7 @@ class Database:
     """PostgreSQL database connection manager with connection pooling."""
     
     _instance: Database | None = None
-    _pool: pool.SimpleConnectionPool | None = None
+    _pool: pool.ThreadedConnectionPool | None = None
     
     def __new__(cls) -> Database:
         """Singleton pattern to ensure single connection pool."""
@@ -27,8 +27,12 @@ class Database:
             self._init_pool()
     
     def _init_pool(self) -> None:
-        """Initialize the connection pool from environment variables."""
-        self._pool = pool.SimpleConnectionPool(
+        """Initialize the connection pool from environment variables.
+        
+        Threaded pool so concurrent request handlers (threads or green threads)
+        can check out connections safely.
+        """
+        self._pool = pool.ThreadedConnectionPool(
             minconn=1,
             maxconn=10,
             host=os.getenv("DATABASE_HOST", "localhost"),
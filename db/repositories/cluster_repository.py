@@ -4,6 +4,7 @@ from __future__ import annotations
 from db.connection import Database
 from db.repositories.base_repository import BaseRepository
 from db.repositories.employee_repository import EmployeeRepository
+from db.repositories.route_repository import RouteRepository
 from models import Cluster, Employee
 
 
@@ -13,6 +14,7 @@ class ClusterRepository(BaseRepository[Cluster]):
     def __init__(self, db: Database | None = None) -> None:
         super().__init__(db)
         self.employee_repo = EmployeeRepository(self.db)
+        self.route_repo = RouteRepository(self.db)
     
     @property
     def table_name(self) -> str:
@@ -35,29 +37,61 @@ class ClusterRepository(BaseRepository[Cluster]):
         # Add employees if provided
         if employees:
             for emp in employees:
-                cluster.employees.append(emp)
-                emp.cluster_id = cluster.id
+                cluster.add_employee(emp)
         
         return cluster
     
-    def find_all(self, limit: int = 1000, include_employees: bool = False) -> list[Cluster]:
-        """Find all active clusters."""
-        query = """
-            SELECT id, zone_id,
-                   ST_AsText(center_location) as center_location_wkt,
-                   ST_AsText(original_center) as original_center_wkt
-            FROM clusters
-            WHERE deleted_at IS NULL
-            ORDER BY id
-            LIMIT %s
+    def find_all(self, limit: int = 1000, include_employees: bool = False,
+                 include_routes: bool = False) -> list[Cluster]:
+        """Find all active clusters.
+        
+        With include_routes, each cluster's latest route is joined in the same
+        query and set as cluster.route (None if the cluster has no route).
         """
+        if include_routes:
+            query = """
+                SELECT c.id, c.zone_id,
+                       ST_AsText(c.center_location) as center_location_wkt,
+                       ST_AsText(c.original_center) as original_center_wkt,
+                       r.id as route_id, r.distance_km, r.duration_min,
+                       r.is_optimized, r.optimization_status,
+                       ST_AsText(r.path_geometry) as path_geometry_wkt
+                FROM clusters c
+                LEFT JOIN LATERAL (
+                    SELECT * FROM routes
+                    WHERE routes.cluster_id = c.id AND routes.deleted_at IS NULL
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                ) r ON true
+                WHERE c.deleted_at IS NULL
+                ORDER BY c.id
+                LIMIT %s
+            """
+        else:
+            query = """
+                SELECT id, zone_id,
+                       ST_AsText(center_location) as center_location_wkt,
+                       ST_AsText(original_center) as original_center_wkt
+                FROM clusters
+                WHERE deleted_at IS NULL
+                ORDER BY id
+                LIMIT %s
+            """
         rows = self.db.fetchall(query, (limit,))
+        employees_by_cluster = {}
+        if include_employees:
+            employees_by_cluster = self.employee_repo.find_by_cluster_ids([row["id"] for row in rows])
+        stops_by_route = {}
+        if include_routes:
+            stops_by_route = self.route_repo.find_stops_by_route_ids(
+                [row["route_id"] for row in rows if row["route_id"] is not None]
+            )
         clusters = []
         for row in rows:
-            employees = None
-            if include_employees:
-                employees = self.employee_repo.find_by_cluster(row["id"])
-            clusters.append(self.to_model(row, employees))
+            cluster = self.to_model(row, employees_by_cluster.get(row["id"]))
+            if include_routes and row["route_id"] is not None:
+                cluster.assign_route(self.route_repo.to_model(row, stops_by_route.get(row["route_id"])))
+            clusters.append(cluster)
         return clusters
     
     def find_by_id(self, id: int, include_employees: bool = True) -> Cluster | None:
@@ -1,6 +1,8 @@
 """Repository for Employee entity."""
 from __future__ import annotations
 
+from psycopg2.extras import execute_values
+
 from db.connection import Database
 from db.repositories.base_repository import BaseRepository
 from models import Employee
@@ -76,6 +78,23 @@ class EmployeeRepository(BaseRepository[Employee]):
         rows = self.db.fetchall(query, (cluster_id,))
         return [self.to_model(row) for row in rows]
 
+    def find_by_cluster_ids(self, cluster_ids: list[int]) -> dict[int, list[Employee]]:
+        """Find employees of many clusters in one query. Returns {cluster_id: employees}."""
+        if not cluster_ids:
+            return {}
+        query = """
+            SELECT id, full_name, zone_id, cluster_id, is_excluded, exclusion_reason,
+                   ST_AsText(home_location) as home_location_wkt,
+                   ST_AsText(pickup_point) as pickup_point_wkt
+            FROM employees
+            WHERE cluster_id = ANY(%s) AND deleted_at IS NULL
+            ORDER BY cluster_id, id
+        """
+        by_cluster: dict[int, list[Employee]] = {}
+        for row in self.db.fetchall(query, (list(cluster_ids),)):
+            by_cluster.setdefault(row["cluster_id"], []).append(self.to_model(row))
+        return by_cluster
+
     def count_by_cluster(self, cluster_id: int) -> int:
         """Count employees in a cluster without loading records."""
         query = """
@@ -85,6 +104,28 @@ class EmployeeRepository(BaseRepository[Employee]):
         """
         return self.db.fetchval(query, (cluster_id,)) or 0
 
+    def count_active(self) -> int:
+        """Count employees that are not excluded from shuttle service."""
+        query = """
+            SELECT COUNT(*)
+            FROM employees
+            WHERE deleted_at IS NULL AND NOT COALESCE(is_excluded, false)
+        """
+        return self.db.fetchval(query) or 0
+
+    def count_by_cluster_ids(self, cluster_ids: list[int]) -> dict[int, int]:
+        """Count employees for many clusters in one query. Returns {cluster_id: count}."""
+        if not cluster_ids:
+            return {}
+        query = """
+            SELECT cluster_id, COUNT(*) as employee_count
+            FROM employees
+            WHERE cluster_id = ANY(%s) AND deleted_at IS NULL
+            GROUP BY cluster_id
+        """
+        rows = self.db.fetchall(query, (list(cluster_ids),))
+        return {row["cluster_id"]: row["employee_count"] for row in rows}
+
 
     def save(self, employee: Employee) -> int:
         """Insert or update an employee. Returns the ID."""
@@ -187,3 +228,19 @@ class EmployeeRepository(BaseRepository[Employee]):
         """
         self.db.execute(query, (pickup_wkt, employee_id))
         return True
+    
+    def bulk_update_pickup_points(self, pairs: list[tuple[int, tuple[float, float]]]) -> int:
+        """Update many pickup points in one statement. Returns count of pairs sent."""
+        if not pairs:
+            return 0
+        query = """
+            UPDATE employees AS e SET
+                pickup_point = ST_GeomFromText(v.pickup_wkt, 4326),
+                updated_at = now()
+            FROM (VALUES %s) AS v(id, pickup_wkt)
+            WHERE e.id = v.id AND e.deleted_at IS NULL
+        """
+        values = [(emp_id, self.point_to_wkt(pp[0], pp[1])) for emp_id, pp in pairs]
+        with self.db.get_cursor(dict_cursor=False) as cursor:
+            execute_values(cursor, query, values, page_size=1000)
+        return len(values)
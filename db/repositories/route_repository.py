@@ -69,6 +69,66 @@ class RouteRepository(BaseRepository[Route]):
         stops = self._get_stops(row["id"])
         return self.to_model(row, stops)
     
+    def find_by_cluster_ids(self, cluster_ids: list[int]) -> dict[int, Route]:
+        """Find the latest route for each cluster in two queries. Returns {cluster_id: Route}."""
+        if not cluster_ids:
+            return {}
+        query = """
+            SELECT DISTINCT ON (cluster_id)
+                   id, cluster_id, vehicle_id, distance_km, duration_min,
+                   is_optimized, optimization_status,
+                   ST_AsText(path_geometry) as path_geometry_wkt
+            FROM routes
+            WHERE cluster_id = ANY(%s) AND deleted_at IS NULL
+            ORDER BY cluster_id, created_at DESC
+        """
+        rows = self.db.fetchall(query, (list(cluster_ids),))
+        if not rows:
+            return {}
+        
+        stops_by_route = self.find_stops_by_route_ids([row["id"] for row in rows])
+        return {row["cluster_id"]: self.to_model(row, stops_by_route.get(row["id"]))
+                for row in rows}
+    
+    def find_cluster_ids_with_routes(self) -> list[int]:
+        """IDs of active clusters that have an active route."""
+        query = """
+            SELECT DISTINCT r.cluster_id
+            FROM routes r
+            JOIN clusters c ON c.id = r.cluster_id AND c.deleted_at IS NULL
+            WHERE r.deleted_at IS NULL
+        """
+        return [row["cluster_id"] for row in self.db.fetchall(query)]
+    
+    def get_totals(self) -> tuple[float, float, int]:
+        """Sum distance/duration over routes of active clusters. Returns (km, min, count)."""
+        query = """
+            SELECT COALESCE(SUM(r.distance_km), 0) as distance_km,
+                   COALESCE(SUM(r.duration_min), 0) as duration_min,
+                   COUNT(*) as route_count
+            FROM routes r
+            JOIN clusters c ON c.id = r.cluster_id AND c.deleted_at IS NULL
+            WHERE r.deleted_at IS NULL
+        """
+        row = self.db.fetchone(query)
+        return float(row["distance_km"]), float(row["duration_min"]), int(row["route_count"])
+    
+    def find_stops_by_route_ids(self, route_ids: list[int]) -> dict[int, list[dict]]:
+        """Find stops for many routes in one query. Returns {route_id: [stop rows]}."""
+        if not route_ids:
+            return {}
+        query = """
+            SELECT id, route_id, stop_sequence, stop_type, estimated_arrival,
+                   ST_AsText(location) as location_wkt
+            FROM route_stops
+            WHERE route_id = ANY(%s) AND deleted_at IS NULL
+            ORDER BY route_id, stop_sequence
+        """
+        stops_by_route: dict[int, list[dict]] = {}
+        for stop_row in self.db.fetchall(query, (list(route_ids),)):
+            stops_by_route.setdefault(stop_row["route_id"], []).append(stop_row)
+        return stops_by_route
+    
     def _get_stops(self, route_id: int) -> list[dict]:
         """Get all stops for a route."""
         query = """
@@ -7,10 +7,12 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from shapely.geometry import Point, LineString, MultiPoint
-from shapely.ops import nearest_points
-
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+from shapely.strtree import STRtree
 
+from routing import OSRMRouter
 from utils import haversine
 
 
@@ -21,6 +23,10 @@ from utils import haversine
 class Employee:
     """Represents an employee with geographic location and pickup assignment."""
     
+    # Thousands are loaded per request; slots drop the per-instance __dict__
+    __slots__ = ('id', 'lat', 'lon', 'name', 'cluster_id', 'zone_id', 'excluded',
+                 'exclusion_reason', 'pickup_point', 'walking_distance')
+    
     def __init__(self, id: int, lat: float, lon: float, name: str | None = None) -> None:
         self.id = id
         self.lat = lat
@@ -67,10 +73,45 @@ class Cluster:
         self.stops: list[tuple[float, float]] = []
         self.stop_assignments: dict[int, int] = {}
         self.stop_loads: list[int] = []
+        self._arrays: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+    
+    @property
+    def employees(self) -> list[Employee]:
+        """Member employees. Mutate via add_employee/remove_employee or reassign the
+        whole list so the coords()/ids() cache is invalidated."""
+        return self._employees
+    
+    @employees.setter
+    def employees(self, employees: list[Employee]) -> None:
+        self._employees = employees
+        self._arrays = None
     
     def add_employee(self, employee: Employee) -> None:
-        self.employees.append(employee)
+        self._employees.append(employee)
         employee.cluster_id = self.id
+        self._arrays = None
+    
+    def remove_employee(self, employee: Employee) -> None:
+        self._employees.remove(employee)
+        self._arrays = None
+    
+    def _employee_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._arrays is None:
+            self._arrays = (
+                np.fromiter((e.lat for e in self.employees), dtype=np.float64, count=len(self.employees)),
+                np.fromiter((e.lon for e in self.employees), dtype=np.float64, count=len(self.employees)),
+                np.fromiter((e.id for e in self.employees), dtype=np.int64, count=len(self.employees)),
+            )
+        return self._arrays
+    
+    def coords(self) -> tuple[np.ndarray, np.ndarray]:
+        """Cached (lats, lons) arrays of all employees, including excluded ones."""
+        lats, lons, _ = self._employee_arrays()
+        return lats, lons
+    
+    def ids(self) -> np.ndarray:
+        """Cached employee ID array, aligned with coords()."""
+        return self._employee_arrays()[2]
     
     def get_active_employees(self) -> list[Employee]:
         return [emp for emp in self.employees if not emp.excluded]
@@ -127,6 +168,36 @@ class Route:
     def set_stops(self, stops: list) -> None:
         self.stops = stops
     
+    @staticmethod
+    def build_stops_tree(stops: list | np.ndarray) -> STRtree | None:
+        """Spatial index over (lat, lon) stops, in the axis order Route geometries use."""
+        if len(stops) == 0:
+            return None
+        return STRtree(shapely.points(np.asarray(stops, dtype=np.float64)))
+    
+    @staticmethod
+    def _stops_near(line: LineString, stops: list, buffer_deg: float,
+                    stops_tree: STRtree | None = None) -> np.ndarray:
+        """Sorted indices of stops within buffer_deg of line, via stops_tree when given."""
+        if stops_tree is not None:
+            return np.sort(stops_tree.query(line, predicate='dwithin', distance=buffer_deg))
+        if len(stops) == 0:
+            return np.empty(0, dtype=np.intp)
+        pts = shapely.points(np.asarray(stops, dtype=np.float64))
+        return np.flatnonzero(shapely.distance(line, pts) < buffer_deg)
+    
+    @staticmethod
+    def _right_side_mask(line: LineString, stops: list) -> np.ndarray:
+        """Boolean mask of stops lying on the right side of line (cross product >= 0)."""
+        pts = shapely.points(np.asarray(stops, dtype=np.float64))
+        pos = shapely.line_locate_point(line, pts)
+        delta = 1e-5
+        p1 = shapely.get_coordinates(shapely.line_interpolate_point(line, np.maximum(0, pos - delta)))
+        p2 = shapely.get_coordinates(shapely.line_interpolate_point(line, np.minimum(line.length, pos + delta)))
+        v = p2 - p1
+        w = shapely.get_coordinates(pts) - p1
+        return v[:, 0] * w[:, 1] - v[:, 1] * w[:, 0] >= -1e-10
+    
     def calculate_stats_from_stops(self) -> None:
         if not self.stops or len(self.stops) < 2:
             self.distance_km = self.duration_min = 0
@@ -139,7 +210,8 @@ class Route:
         self,
         all_stops: list,
         buffer_meters: float = 150,
-        same_side_only: bool = True
+        same_side_only: bool = True,
+        stops_tree: STRtree | None = None
     ) -> list[tuple[float, float]]:
         """Find ALL bus stops within buffer_meters of the route path.
         
@@ -147,6 +219,7 @@ class Route:
             all_stops: List of (lat, lon) tuples of all known bus stops.
             buffer_meters: Search buffer in meters (default 150m).
             same_side_only: If True, only include stops on the right side of the route.
+            stops_tree: Optional build_stops_tree(all_stops) to range-query instead of scanning.
         
         Returns:
             List of (lat, lon) tuples of bus stops along the route, ordered by position on route.
@@ -160,35 +233,18 @@ class Route:
             # ~1 degree lat ≈ 111,000m; at Istanbul's latitude ~1 degree lon ≈ 85,000m
             buffer_deg = buffer_meters / 111_000  # conservative estimate
             
-            found_stops = []
-            for s in all_stops:
-                s_point = Point(s[0], s[1])
-                if line.distance(s_point) < buffer_deg:
-                    # Store with position along route for ordering
-                    pos = line.project(s_point)
-                    
-                    # Filter by side if requested
-                    if same_side_only:
-                        delta = 1e-5
-                        p1 = line.interpolate(max(0, pos - delta))
-                        p2 = line.interpolate(min(line.length, pos + delta))
-                        
-                        vx = p2.x - p1.x
-                        vy = p2.y - p1.y
-                        wx = s_point.x - p1.x
-                        wy = s_point.y - p1.y
-                        
-                        cross_product = vx * wy - vy * wx
-                        
-                        # Only include if on the right side (cross product >= 0)
-                        if cross_product < -1e-10:
-                            continue
-                    
-                    found_stops.append((pos, s))
+            candidates = [all_stops[i] for i in self._stops_near(line, all_stops, buffer_deg, stops_tree).tolist()]
+            
+            # Filter by side if requested
+            if same_side_only and candidates:
+                right_side = self._right_side_mask(line, candidates)
+                candidates = [s for s, keep in zip(candidates, right_side.tolist()) if keep]
             
             # Sort by position along the route
-            found_stops.sort(key=lambda x: x[0])
-            self.bus_stops = [s for _, s in found_stops]
+            if candidates:
+                pos = shapely.line_locate_point(line, shapely.points(np.asarray(candidates, dtype=np.float64)))
+                candidates = [candidates[i] for i in np.argsort(pos, kind='stable').tolist()]
+            self.bus_stops = candidates
             return self.bus_stops
         except Exception:
             return []
@@ -198,8 +254,15 @@ class Route:
         employees: list[Employee],
         safe_stops: list | None = None,
         buffer_meters: float = 150,
+        stops_tree: STRtree | None = None,
+        router: OSRMRouter | None = None,
     ) -> int:
-        """Match employees to pickup points along the route."""
+        """Match employees to pickup points along the route.
+        
+        stops_tree, if given, must be build_stops_tree(safe_stops); it replaces
+        the linear distance scan over safe_stops with one index query.
+        router is the OSRMRouter to reuse; a new one is created when omitted.
+        """
         if not self.coordinates or len(self.coordinates) < 2:
             return 0
         
@@ -211,93 +274,51 @@ class Route:
             
             # Add safe stops near the route (within buffer_meters of route)
             buffer_deg = buffer_meters / 111_000  # meters -> degrees (approx)
-            if safe_stops and len(safe_stops) > 0:
-                for s in safe_stops:
-                    s_point = Point(s[0], s[1])
-                    if line.distance(s_point) < buffer_deg:
-                        valid_route_stops.append(s)
+            if safe_stops:
+                near = self._stops_near(line, safe_stops, buffer_deg, stops_tree)
+                valid_route_stops.extend(safe_stops[i] for i in near.tolist())
             
             # Filter stops to only those on the right side of the route
             if valid_route_stops:
-                filtered_stops = []
-                for s in valid_route_stops:
-                    s_point = Point(s[0], s[1])
-                    dist = line.project(s_point)
-                    
-                    delta = 1e-5
-                    p1 = line.interpolate(max(0, dist - delta))
-                    p2 = line.interpolate(min(line.length, dist + delta))
-                    
-                    vx = p2.x - p1.x
-                    vy = p2.y - p1.y
-                    wx = s_point.x - p1.x
-                    wy = s_point.y - p1.y
-                    
-                    cross_product = vx * wy - vy * wx
-                    
-                    if cross_product >= -1e-10:
-                        filtered_stops.append(s)
-                
-                valid_route_stops = filtered_stops
-            
-            # Match employees to stops using OSRM distance matrix
-            if valid_route_stops:
-                active_employees = [e for e in employees if not e.excluded]
-                
-                if not active_employees:
-                    return 0
-                    
-                from routing import OSRMRouter
-                router = OSRMRouter()
-                
-                emp_locs = [(e.lat, e.lon) for e in active_employees]
-                distances_matrix = router.get_distance_matrix(emp_locs, valid_route_stops, profile='foot')
-                
-                if distances_matrix:
-                    for i, employee in enumerate(active_employees):
-                        dists = distances_matrix[i]
-                        
-                        min_dist_meters = float('inf')
-                        best_stop_idx = -1
-                        
-                        for stop_idx, dist in enumerate(dists):
-                            if dist is not None and dist < min_dist_meters:
-                                min_dist_meters = dist
-                                best_stop_idx = stop_idx
-                        
-                        if best_stop_idx != -1:
-                            best_stop = valid_route_stops[best_stop_idx]
-                            employee.set_pickup_point(best_stop[0], best_stop[1], type="stop", walking_distance=min_dist_meters)
-                            matched_count += 1
-                    
-                    return matched_count
+                right_side = self._right_side_mask(line, valid_route_stops)
+                valid_route_stops = [s for s, keep in zip(valid_route_stops, right_side.tolist()) if keep]
             
             # Only use real bus stops from safe_stops - no custom pickup point generation
             if not valid_route_stops:
                 return 0
             
-            valid_stops_multipoint = None
-            try:
-                valid_stops_multipoint = MultiPoint([(s[0], s[1]) for s in valid_route_stops])
-            except Exception:
+            active_employees = [e for e in employees if not e.excluded]
+            if not active_employees:
                 return 0
             
-            for employee in employees:
-                if employee.excluded:
-                    continue
-                
-                emp_point = Point(employee.lat, employee.lon)
-                
-                # Only assign to real bus stops, not projected points on the route
-                if valid_stops_multipoint:
-                    nearest_stop = nearest_points(emp_point, valid_stops_multipoint)[1]
-                    employee.set_pickup_point(nearest_stop.x, nearest_stop.y, type="stop")
-                    matched_count += 1
-                
+            # Match employees to stops using OSRM distance matrix
+            router = router or OSRMRouter()
+            emp_locs = [(e.lat, e.lon) for e in active_employees]
+            distances_matrix = router.get_distance_matrix(emp_locs, valid_route_stops, profile='foot')
+            
+            if distances_matrix:
+                # None (unreachable) becomes NaN -> inf so argmin skips it
+                dists = np.array(distances_matrix, dtype=np.float64)
+                dists[np.isnan(dists)] = np.inf
+                best = dists.argmin(axis=1)
+                best_dist = dists[np.arange(len(best)), best]
+                for employee, stop_idx, dist in zip(active_employees, best.tolist(), best_dist.tolist()):
+                    if dist != float('inf'):
+                        best_stop = valid_route_stops[stop_idx]
+                        employee.set_pickup_point(best_stop[0], best_stop[1], type="stop", walking_distance=dist)
+                        matched_count += 1
+                return matched_count
+            
+            # OSRM unavailable: nearest stop by straight-line distance in degrees
+            stops_xy = np.asarray(valid_route_stops, dtype=np.float64)
+            emp_xy = np.asarray(emp_locs, dtype=np.float64)
+            d2 = ((emp_xy[:, None, :] - stops_xy[None, :, :])**2).sum(axis=2)
+            for employee, stop_idx in zip(active_employees, d2.argmin(axis=1).tolist()):
+                best_stop = valid_route_stops[stop_idx]
+                employee.set_pickup_point(best_stop[0], best_stop[1], type="stop")
+                matched_count += 1
             return matched_count
             
-        except ImportError:
-            return 0
         except Exception:
             return 0
 
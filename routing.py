@@ -1,16 +1,18 @@
 """
 OSRM routing integration with caching.
 
-Contains: APICache, OSRMRouter
+Contains: APICache, make_session, OSRMRouter
 """
 from __future__ import annotations
 
 import hashlib
 import json
 import os
+import threading
 from datetime import datetime
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
 # =============================================================================
@@ -23,6 +25,7 @@ class APICache:
     def __init__(self, cache_file: str = 'data/osrm_cache.json') -> None:
         self.cache_file = cache_file
         self.cache: dict = self._load_cache()
+        self._lock = threading.Lock()  # routers may be shared across request threads
     
     def _load_cache(self) -> dict:
         if os.path.exists(self.cache_file):
@@ -49,8 +52,9 @@ class APICache:
     
     def set(self, points: list, departure_time: datetime | None, data: dict) -> None:
         key = self._generate_key(points, departure_time)
-        self.cache[key] = data.copy()
-        self._save_cache()
+        with self._lock:
+            self.cache[key] = data.copy()
+            self._save_cache()
 
     def _generate_matrix_key(self, origins: list, destinations: list, profile: str) -> str:
         o_str = '_'.join([f"{lat:.6f},{lon:.6f}" for lat, lon in origins])
@@ -61,20 +65,32 @@ class APICache:
         return self.cache.get(self._generate_matrix_key(origins, destinations, profile))
 
     def set_matrix(self, origins: list, destinations: list, profile: str, data: list) -> None:
-        self.cache[self._generate_matrix_key(origins, destinations, profile)] = data
-        self._save_cache()
+        with self._lock:
+            self.cache[self._generate_matrix_key(origins, destinations, profile)] = data
+            self._save_cache()
 
 
 # =============================================================================
 # OSRM Router
 # =============================================================================
 
+def make_session(pool_connections: int = 16, pool_maxsize: int = 64) -> requests.Session:
+    """requests.Session with a keep-alive connection pool sized for concurrent callers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class OSRMRouter:
     """Client for OSRM routing API."""
     
-    def __init__(self, base_url: str = "http://localhost:5001", cache_enabled: bool = True) -> None:
+    def __init__(self, base_url: str = "http://localhost:5001", cache_enabled: bool = True,
+                 session: requests.Session | None = None) -> None:
         self.base_url = base_url
         self.cache = APICache(cache_file='data/osrm_cache.json') if cache_enabled else None
+        self.session = session or make_session()
     
     def get_route(self, points: list[tuple[float, float]], profile: str = 'driving') -> dict:
         if self.cache:
@@ -86,7 +102,7 @@ class OSRMRouter:
         url = f"{self.base_url}/route/v1/{profile}/{coords}"
         
         try:
-            resp = requests.get(url, params={'overview': 'full', 'geometries': 'geojson'}, timeout=15)
+            resp = self.session.get(url, params={'overview': 'full', 'geometries': 'geojson'}, timeout=15)
             resp.raise_for_status()
             data = resp.json()
             
@@ -124,7 +140,7 @@ class OSRMRouter:
         }
         
         try:
-            resp = requests.get(url, params=params, timeout=15)
+            resp = self.session.get(url, params=params, timeout=15)
             resp.raise_for_status()
             data = resp.json()
             
@@ -139,9 +155,24 @@ class OSRMRouter:
             print(f"OSRM Matrix API error: {e}")
             return None
     
+    def get_pairwise_distances(self, origins: list, destinations: list, profile: str = 'foot') -> list | None:
+        """Distance from origins[i] to destinations[i] for each i.
+        
+        OSRM's table service cannot return just the diagonal, so destinations are
+        de-duplicated first; pickup points are shared, making this N x unique(P).
+        """
+        if not origins:
+            return []
+        unique_dests = list(dict.fromkeys(tuple(d) for d in destinations))
+        dest_index = {d: j for j, d in enumerate(unique_dests)}
+        matrix = self.get_distance_matrix(list(origins), unique_dests, profile=profile)
+        if not matrix:
+            return None
+        return [matrix[i][dest_index[tuple(d)]] for i, d in enumerate(destinations)]
+    
     def snap_to_road(self, lat: float, lon: float, profile: str = 'driving') -> dict | None:
         try:
-            resp = requests.get(
+            resp = self.session.get(
                 f"{self.base_url}/nearest/v1/{profile}/{lon},{lat}",
                 params={'number': 1}, timeout=10
             )
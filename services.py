@@ -6,20 +6,29 @@ Contains: LocationService, ClusteringService, RoutingService,
 """
 from __future__ import annotations
 
+import gzip
 import hashlib
+import io
+import json
 import math
 import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import chain
 
 import folium
 import numpy as np
-from shapely.geometry import Point, box, MultiLineString, LineString
-from shapely.ops import unary_union, polygonize
-from pyrosm import OSM
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+import shapely
+from shapely.geometry import box, MultiLineString, LineString
+from shapely.ops import unary_union
+from shapely.strtree import STRtree
 
 from models import Employee, Cluster, Route, Vehicle
-from utils import DataGenerator, KMeansClusterer
+from utils import DataGenerator, KMeansClusterer, cached_osm_query, encode_polyline, haversine_vec
 from routing import OSRMRouter
 
 
@@ -187,6 +196,42 @@ class RoutingService:
 # Visualization Service
 # =============================================================================
 
+_BUS_STOP_ICON_HTML = '<div style="font-size: 18px; color: green; text-shadow: 1px 1px 2px white;"><i class="fa fa-bus"></i></div>'
+_CLUSTER_BADGE_CSS = ('<style>.cluster-badge{color:white;padding:5px;border-radius:50%;width:30px;height:30px;'
+                      'text-align:center;line-height:30px;font-weight:bold;border:3px solid white}</style>')
+
+
+class _EncodedPolyline(JSCSSMixin, MacroElement):
+    """Route line shipped as an encoded polyline and decoded by Leaflet at runtime."""
+    
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        L.Polyline.fromEncoded({{ this.encoded|tojson }}, {{ this.options|tojson }})
+            {%- if this.popup %}.bindPopup({{ this.popup|tojson }}){% endif %}
+            .addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+    default_js = [("polyline_encoded", "https://unpkg.com/polyline-encoded@0.0.9/Polyline.encoded.js")]
+    
+    def __init__(self, coordinates: list, popup: str | None = None, **options) -> None:
+        super().__init__()
+        self._name = "EncodedPolyline"
+        self.encoded = encode_polyline(coordinates)
+        self.popup = popup
+        self.options = options
+
+
+class _ScriptElement(MacroElement):
+    """Raw JavaScript emitted into the map's script block after the map is created."""
+    
+    _template = Template("{% macro script(this, kwargs) %}{{ this.js }}{% endmacro %}")
+    
+    def __init__(self, js: str) -> None:
+        super().__init__()
+        self._name = "ScriptElement"
+        self.js = js
+
+
 class VisualizationService:
     """Service for creating map visualizations."""
     
@@ -202,6 +247,20 @@ class VisualizationService:
             self.colors[id] = f'hsl({h}, {random.randint(65,95)}%, {random.randint(40,70)}%)'
         return self.colors[id]
     
+    def _write_html(self, fn: str, html: str) -> str:
+        """Write rendered HTML with a large buffer, gzipped if COMPRESS_MAPS is set."""
+        if getattr(self.config, 'COMPRESS_MAPS', False):
+            fn += '.gz'
+            with gzip.open(fn, 'wt', encoding='utf-8', compresslevel=3) as f:
+                f.write(html)
+        else:
+            with open(fn, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                f.write(html)
+        return fn
+    
+    def _save_map(self, m: folium.Map, fn: str) -> str:
+        return self._write_html(fn, m.get_root().render())
+    
     def create_employees_map(self, employees: list[Employee]) -> str:
         fn = "maps/employees.html"
         if not employees:
@@ -211,40 +270,53 @@ class VisualizationService:
         folium.Marker(self.office_location, popup="Office", icon=folium.Icon(color='red', icon='home', prefix='fa')).add_to(m)
         for e in employees:
             folium.CircleMarker([e.lat, e.lon], radius=4, color='#2563eb', fill=True).add_to(m)
-        m.save(fn)
-        return fn
+        return self._save_map(m, fn)
     
     def create_clusters_map(self, clusters: list[Cluster]) -> str:
         fn = "maps/clusters.html"
-        all_emps = [e for c in clusters for e in c.employees]
-        if not all_emps:
+        if not any(c.employees for c in clusters):
             return fn
-        m = folium.Map(location=[sum(e.lat for e in all_emps)/len(all_emps), 
-                                  sum(e.lon for e in all_emps)/len(all_emps)], zoom_start=12)
+        lats = np.concatenate([c.coords()[0] for c in clusters])
+        lons = np.concatenate([c.coords()[1] for c in clusters])
+        m = folium.Map(location=[float(lats.mean()), float(lons.mean())], zoom_start=12)
         folium.Marker(self.office_location, popup="Office", icon=folium.Icon(color='red', icon='home', prefix='fa')).add_to(m)
         for c in clusters:
             folium.Marker(c.center, popup=f"Cluster {c.id}", icon=folium.Icon(color='black', icon='star', prefix='fa')).add_to(m)
-        for e in all_emps:
-            folium.CircleMarker([e.lat, e.lon], radius=5, color=self._color(e.cluster_id), fill=True).add_to(m)
-        m.save(fn)
-        return fn
+        # One GeoJson layer with a shared popup template instead of a marker per employee
+        features = []
+        for c in clusters:
+            c_lats, c_lons = c.coords()
+            color = self._color(c.id)
+            features.extend({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': {'id': emp_id, 'cluster': c.id, 'color': color},
+            } for lat, lon, emp_id in zip(c_lats.tolist(), c_lons.tolist(), c.ids().tolist()))
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            marker=folium.CircleMarker(radius=5, fill=True),
+            style_function=lambda f: {'color': f['properties']['color'], 'fillColor': f['properties']['color']},
+            popup=folium.GeoJsonPopup(fields=['id', 'cluster'], aliases=['ID:', 'Cluster:'], localize=False),
+        ).add_to(m)
+        return self._save_map(m, fn)
     
     def create_routes_map(self, clusters: list[Cluster]) -> str:
         fn = "maps/optimized_routes.html"
         m = folium.Map(location=self.office_location, zoom_start=11)
         folium.Marker(self.office_location, popup="Office", icon=folium.Icon(color='red', icon='home', prefix='fa')).add_to(m)
+        m.get_root().header.add_child(folium.Element(_CLUSTER_BADGE_CSS))
         
+        CircleMarker, add = folium.CircleMarker, m.add_child
         for c in clusters:
             if not c.route:
                 continue
             color = self._color(c.id)
             if c.route.coordinates:
-                folium.PolyLine(c.route.coordinates, color=color, weight=4, opacity=0.7).add_to(m)
+                _EncodedPolyline(c.route.coordinates, color=color, weight=4, opacity=0.7).add_to(m)
             for e in c.get_active_employees():
-                folium.CircleMarker(e.get_location(), radius=3, color=color, fill=True).add_to(m)
-            folium.Marker(c.center, icon=folium.DivIcon(html=f'<div style="background:{color};color:white;padding:5px;border-radius:50%;width:30px;height:30px;text-align:center;line-height:30px;font-weight:bold;border:3px solid white">{c.id}</div>')).add_to(m)
-        m.save(fn)
-        return fn
+                add(CircleMarker(e.get_location(), radius=3, color=color, fill=True))
+            folium.Marker(c.center, icon=folium.DivIcon(html=f'<div class="cluster-badge" style="background:{color}">{c.id}</div>')).add_to(m)
+        return self._save_map(m, fn)
     
     def create_cluster_detail_map(self, cluster: Cluster) -> str:
         os.makedirs("maps/detailed", exist_ok=True)
@@ -260,75 +332,79 @@ class VisualizationService:
         folium.Marker(cluster.center, popup=f"<b>Cluster {cluster.id} Center</b>", 
                       icon=folium.Icon(color='black', icon='star', prefix='fa')).add_to(m)
         
+        # Employee layers are emitted as one script instead of a Folium object
+        # (and Jinja render) per marker
+        layers, canvas = f"layers_{cluster.id}", f"canvas_{cluster.id}"
+        js = io.StringIO()
+        js.write(f"var {layers} = [];\nvar {canvas} = L.canvas();\n")
+        # Shared icon templates; per-marker output only carries the distance
+        js.write("var busStopIcon = L.divIcon({className: 'empty', iconSize: [20, 20], iconAnchor: [10, 10], "
+                 f"html: {json.dumps(_BUS_STOP_ICON_HTML)}}});\n")
+        js.write("function walkLabel(d) { return L.divIcon({className: 'empty', iconSize: [80, 20], "
+                 "iconAnchor: [40, 10], html: '<div class=\"walk-label\">' + d + 'm</div>'}); }\n")
+        m.get_root().header.add_child(folium.Element(
+            f"<style>.walk-label{{font-size:10px;color:{color};font-weight:bold;background:rgba(255,255,255,0.8);"
+            f"padding:1px 4px;border-radius:3px;text-align:center;}}</style>"))
+        
+        # Walking distances for every employee with a pickup point, in one vectorized pass
+        walkers = [e for e in cluster.employees if not e.excluded and e.pickup_point]
+        walk_distances = {}
+        if walkers:
+            dists = haversine_vec(np.array([e.lat for e in walkers]), np.array([e.lon for e in walkers]),
+                                  np.array([e.pickup_point[0] for e in walkers]),
+                                  np.array([e.pickup_point[1] for e in walkers]))
+            walk_distances = dict(zip((e.id for e in walkers), dists.tolist()))
+        
         # Track unique pickup points to draw bus stop markers
         pickup_points_drawn = set()
         
         # Employees with pickup lines
         for employee in cluster.employees:
+            lat, lon = employee.lat, employee.lon
             if employee.excluded:
-                folium.CircleMarker(
-                    location=employee.get_location(), radius=4, color='gray',
-                    fill=True, fillColor='lightgray', fillOpacity=0.5,
-                    popup=f"<b>ID:</b> {employee.id}<br><b>Status:</b> Excluded<br><b>Reason:</b> {employee.exclusion_reason}"
-                ).add_to(m)
-            else:
-                # Get pickup point
-                target_location = employee.pickup_point if hasattr(employee, 'pickup_point') and employee.pickup_point else None
+                popup = f"<b>ID:</b> {employee.id}<br><b>Status:</b> Excluded<br><b>Reason:</b> {employee.exclusion_reason}"
+                js.write(f"{layers}.push(L.circleMarker([{lat}, {lon}], {{radius: 4, color: 'gray', fill: true, "
+                         f"fillColor: 'lightgray', fillOpacity: 0.5, renderer: {canvas}}}).bindPopup({json.dumps(popup)}));\n")
+                continue
+            
+            # Get pickup point
+            target_location = employee.pickup_point
+            
+            if target_location:
+                t_lat, t_lon = target_location
+                walk_distance = walk_distances[employee.id]
                 
-                if target_location:
-                    walk_distance = employee.distance_to(target_location[0], target_location[1])
-                    
-                    # Draw walking line (dashed)
-                    folium.PolyLine(
-                        [employee.get_location(), target_location],
-                        color=color, weight=1.5, opacity=0.6, dash_array='5, 5',
-                        popup=f"Walk: {walk_distance:.0f}m"
-                    ).add_to(m)
-                    
-                    # Walking distance label at midpoint
-                    midpoint = [(employee.lat + target_location[0]) / 2, (employee.lon + target_location[1]) / 2]
-                    folium.Marker(
-                        location=midpoint,
-                        icon=folium.DivIcon(icon_size=(80, 20), icon_anchor=(40, 10), html=f'''
-                            <div style="font-size: 10px; color: {color}; font-weight: bold; 
-                                 background: rgba(255,255,255,0.8); padding: 1px 4px; border-radius: 3px;
-                                 text-align: center;">{walk_distance:.0f}m</div>
-                        ''')
-                    ).add_to(m)
-                    
-                    # Draw bus stop marker (only once per unique location)
-                    stop_key = (round(target_location[0], 6), round(target_location[1], 6))
-                    
-                    if stop_key not in pickup_points_drawn:
-                        folium.Marker(
-                            location=target_location,
-                            icon=folium.DivIcon(
-                                html='<div style="font-size: 18px; color: green; text-shadow: 1px 1px 2px white;"><i class="fa fa-bus"></i></div>',
-                                icon_size=(20, 20), icon_anchor=(10, 10)
-                            ),
-                            popup="Pickup Stop"
-                        ).add_to(m)
-                        pickup_points_drawn.add(stop_key)
+                # Draw walking line (dashed)
+                js.write(f"{layers}.push(L.polyline([[{lat}, {lon}], [{t_lat}, {t_lon}]], {{color: '{color}', weight: 1.5, "
+                         f"opacity: 0.6, dashArray: '5, 5', renderer: {canvas}}}).bindPopup('Walk: {walk_distance:.0f}m'));\n")
                 
-                # Employee marker
-                folium.CircleMarker(
-                    location=employee.get_location(), radius=5, color=color,
-                    fill=True, fillColor=color, fillOpacity=0.7,
-                    popup=f"<b>ID:</b> {employee.id}", weight=2
-                ).add_to(m)
+                # Walking distance label at midpoint
+                js.write(f"{layers}.push(L.marker([{(lat + t_lat) / 2}, {(lon + t_lon) / 2}], "
+                         f"{{icon: walkLabel({walk_distance:.0f})}}));\n")
+                
+                # Draw bus stop marker (only once per unique location)
+                stop_key = (round(t_lat, 6), round(t_lon, 6))
+                
+                if stop_key not in pickup_points_drawn:
+                    js.write(f"{layers}.push(L.marker([{t_lat}, {t_lon}], {{icon: busStopIcon}}).bindPopup('Pickup Stop'));\n")
+                    pickup_points_drawn.add(stop_key)
+            
+            # Employee marker
+            js.write(f"{layers}.push(L.circleMarker([{lat}, {lon}], {{radius: 5, color: '{color}', weight: 2, fill: true, "
+                     f"fillColor: '{color}', fillOpacity: 0.7, renderer: {canvas}}}).bindPopup('<b>ID:</b> {employee.id}'));\n")
+        
+        js.write(f"L.layerGroup({layers}).addTo({m.get_name()});\n")
+        m.add_child(_ScriptElement(js.getvalue()))
         
         # Route polyline
         if cluster.route and cluster.route.coordinates:
-            folium.PolyLine(cluster.route.coordinates, color=color, weight=5, opacity=0.8,
-                           popup=f"<b>Route</b><br>{cluster.route.distance_km:.1f} km<br>{cluster.route.duration_min:.0f} min").add_to(m)
+            _EncodedPolyline(cluster.route.coordinates, color=color, weight=5, opacity=0.8,
+                             popup=f"<b>Route</b><br>{cluster.route.distance_km:.1f} km<br>{cluster.route.duration_min:.0f} min").add_to(m)
         
-        m.save(fn)
-        return fn
+        return self._save_map(m, fn)
     
     def create_editable_cluster_map(self, cluster: Cluster) -> str:
         """Create an interactive map with draggable route editing using Leaflet Routing Machine."""
-        import json
-        
         os.makedirs("maps/editable", exist_ok=True)
         fn = f"maps/editable/cluster_{cluster.id}_edit.html"
         color = self._color(cluster.id)
@@ -693,19 +769,19 @@ class VisualizationService:
 </body>
 </html>'''
         
-        with open(fn, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return fn
+        return self._write_html(fn, html_content)
 
     
-    def create_zones_map(self, clusters: list[Cluster], zones=None, barrier_roads=None) -> str:
+    def create_zones_map(self, clusters: list[Cluster], zones=None, barrier_roads=None,
+                         all_emps: list[Employee] | None = None) -> str:
         fn = "maps/zones.html"
-        all_emps = [e for c in clusters for e in c.employees]
+        if all_emps is None:
+            all_emps = list(chain.from_iterable(c.employees for c in clusters))
         if not all_emps:
             return fn
-        m = folium.Map(location=[sum(e.lat for e in all_emps)/len(all_emps), 
-                                  sum(e.lon for e in all_emps)/len(all_emps)], zoom_start=12)
+        lats = np.concatenate([c.coords()[0] for c in clusters])
+        lons = np.concatenate([c.coords()[1] for c in clusters])
+        m = folium.Map(location=[float(lats.mean()), float(lons.mean())], zoom_start=12)
         folium.Marker(self.office_location, popup="Office", icon=folium.Icon(color='red', icon='home', prefix='fa')).add_to(m)
         
         if zones:
@@ -725,24 +801,48 @@ class VisualizationService:
             except:
                 pass
         
-        for e in all_emps:
-            folium.CircleMarker([e.lat, e.lon], radius=4, color=self._color(getattr(e, 'zone_id', 0)*10), fill=True).add_to(m)
-        m.save(fn)
-        return fn
+        zone_ids = [getattr(e, 'zone_id', 0) for e in all_emps]
+        colors = {zid: self._color(zid*10) for zid in set(zone_ids)}
+        CircleMarker, add = folium.CircleMarker, m.add_child
+        for e, zid in zip(all_emps, zone_ids):
+            add(CircleMarker([e.lat, e.lon], radius=4, color=colors[zid], fill=True))
+        return self._save_map(m, fn)
     
     def create_all_maps(self, clusters: list[Cluster], zones=None, barrier_roads=None) -> list[str]:
         os.makedirs(self.config.OUTPUT_DIR, exist_ok=True)
-        all_emps = [e for c in clusters for e in c.employees]
-        files = [self.create_employees_map(all_emps), self.create_clusters_map(clusters), self.create_routes_map(clusters)]
+        # Flatten once and share with every map that needs all employees
+        all_emps = list(chain.from_iterable(c.employees for c in clusters))
+        files = [self.create_employees_map(all_emps), self.create_clusters_map(clusters),
+                 self.create_routes_map(clusters)]
         if zones or barrier_roads:
-            files.append(self.create_zones_map(clusters, zones, barrier_roads))
-        for c in clusters:
-            if c.route:  # Only create detailed maps for clusters with routes
-                files.append(self.create_cluster_detail_map(c))
-                files.append(self.create_editable_cluster_map(c))  # Also create editable version
+            files.append(self.create_zones_map(clusters, zones, barrier_roads, all_emps))
+        routed = [c for c in clusters if c.route]  # Only create detailed maps for clusters with routes
+        if not routed:
+            return files
+        # Detail/editable maps are independent per cluster; pre-seed colors so workers agree
+        for c in routed:
+            self._color(c.id)
+        workers = min(os.cpu_count() or 1, len(routed))
+        jobs = [(self.config, self.colors, c) for c in routed]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                results = ex.map(_render_cluster_maps, jobs, chunksize=max(1, len(jobs) // (4 * workers)))
+                for cluster_files in results:
+                    files.extend(cluster_files)
+        else:
+            for job in jobs:
+                files.extend(_render_cluster_maps(job))
         return files
 
 
+def _render_cluster_maps(job: tuple) -> list[str]:
+    """Render the detail and editable maps of one cluster (process pool worker)."""
+    config, colors, cluster = job
+    service = VisualizationService(config)
+    service.colors = colors
+    return [service.create_cluster_detail_map(cluster), service.create_editable_cluster_map(cluster)]
+
+
 # =============================================================================
 # Zone Service
 # =============================================================================
@@ -755,26 +855,27 @@ class ZoneService:
         self.osm_file = getattr(config, 'OSM_FILE', 'data/istanbul-center.osm.pbf')
         self.barrier_types = getattr(config, 'BARRIER_ROAD_TYPES', 
                                      ['motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary'])
-        self._osm = None
+        self.min_zone_area = getattr(config, 'MIN_ZONE_AREA', 0.00001)
         self._barrier_roads = None
         self._zones = []
+        self._zone_tree: STRtree | None = None
         self._stats = {}
     
-    def _load_osm(self) -> None:
-        if self._osm is None:
-            self._osm = OSM(self.osm_file)
-    
     def load_barrier_roads(self):
-        self._load_osm()
-
-        roads = self._osm.get_data_by_custom_criteria(
+        roads = cached_osm_query(
+            self.osm_file, "barrier_roads",
             custom_filter={"highway": self.barrier_types},
             filter_type="keep", keep_nodes=False, keep_ways=True, keep_relations=False
         )
         if roads is None or len(roads) == 0:
 
             return None
-        self._barrier_roads = unary_union(roads.geometry)
+        # Merge the linework instead of a full overlay union; create_zones nodes
+        # the clipped subset anyway when it unions it with the bounding box
+        lines = shapely.get_parts(np.asarray(roads.geometry))
+        lines = lines[shapely.get_type_id(lines) == shapely.GeometryType.LINESTRING]
+        self._barrier_roads = shapely.line_merge(shapely.multilinestrings(lines))
+        shapely.prepare(self._barrier_roads)
 
         return self._barrier_roads
     
@@ -790,8 +891,12 @@ class ZoneService:
         clipped = self._barrier_roads.intersection(bounds)
         
         all_lines = unary_union([clipped, bounds.boundary]) if isinstance(clipped, (LineString, MultiLineString)) else bounds.boundary
-        zones = [z for z in polygonize(all_lines) if z.area > 0.00001]
+        # Polygonize and drop slivers in single vectorized GEOS calls
+        polygons = shapely.get_parts(shapely.polygonize(shapely.get_parts(all_lines)))
+        zones = polygons[shapely.area(polygons) > self.min_zone_area].tolist()
         self._zones = zones
+        # Spatial index over zone polygons for O(log Z) point lookups
+        self._zone_tree = STRtree(zones) if zones else None
 
         return zones
     
@@ -800,19 +905,23 @@ class ZoneService:
             self.create_zones(employees)
         
         assignments = {i: [] for i in range(len(self._zones))}
-        for e in employees:
-            pt = Point(e.lon, e.lat)
-            assigned = False
-            for i, z in enumerate(self._zones):
-                if z.contains(pt):
-                    e.zone_id = i
-                    assignments[i].append(e)
-                    assigned = True
-                    break
-            if not assigned:
-                nearest = min(range(len(self._zones)), key=lambda i: self._zones[i].boundary.distance(pt))
-                e.zone_id = nearest
-                assignments[nearest].append(e)
+        if self._zone_tree is not None and employees:
+            points = shapely.points([e.lon for e in employees], [e.lat for e in employees])
+            
+            # Containing zone per employee (lowest index wins, as zones may touch)
+            n_zones = len(self._zones)
+            zone_idx = np.full(len(employees), n_zones, dtype=np.int64)
+            emp_idx, tree_idx = self._zone_tree.query(points, predicate='within')
+            np.minimum.at(zone_idx, emp_idx, tree_idx)
+            
+            # Employees outside every zone go to the nearest one
+            outside = np.flatnonzero(zone_idx == n_zones)
+            if len(outside):
+                zone_idx[outside] = self._zone_tree.nearest(points[outside])
+            
+            for e, i in zip(employees, zone_idx.tolist()):
+                e.zone_id = i
+                assignments[i].append(e)
         
         self._stats = {'total_zones': len(self._zones), 'empty_zones': sum(1 for v in assignments.values() if not v)}
         assignments = {k: v for k, v in assignments.items() if v}
@@ -849,6 +958,7 @@ class ServicePlanner:
         self.stats = {}
         self.zone_assignments = {}
         self.safe_stops = []
+        self.safe_stops_tree = None
         self.all_employees: list[Employee] = []  # Includes excluded (for DB save)
         
         # Database integration
@@ -983,9 +1093,12 @@ class ServicePlanner:
             if c.route:
                 discovery_buffer = getattr(self.config, 'BUS_STOP_DISCOVERY_BUFFER_METERS', 150)
                 same_side = getattr(self.config, 'FILTER_STOPS_BY_ROUTE_SIDE', True)
-                c.route.find_all_stops_along_route(self.safe_stops, buffer_meters=discovery_buffer, same_side_only=same_side)
+                c.route.find_all_stops_along_route(self.safe_stops, buffer_meters=discovery_buffer, same_side_only=same_side,
+                                                   stops_tree=self.safe_stops_tree)
                 stop_buffer = getattr(self.config, 'ROUTE_STOP_BUFFER_METERS', 15)
-                c.route.match_employees_to_route(c.employees, self.safe_stops, buffer_meters=stop_buffer)
+                c.route.match_employees_to_route(c.employees, self.safe_stops, buffer_meters=stop_buffer,
+                                                 stops_tree=self.safe_stops_tree,
+                                                 router=self.routing_service.osrm_router)
         
         total_bus_stops = sum(len(c.route.bus_stops) for c in self.clusters if c.route)
         print(f"    Bus stops found along routes: {total_bus_stops}")
@@ -1017,6 +1130,9 @@ class ServicePlanner:
             print("    No route stops available for reassignment")
             return {'reassigned': 0, 'checked': 0}
         
+        stop_lats = np.array([s[0] for s in all_route_stops])
+        stop_lons = np.array([s[1] for s in all_route_stops])
+        
         # Find employees with excessive walking distance
         reassigned_count = 0
         checked_count = 0
@@ -1048,14 +1164,13 @@ class ServicePlanner:
                 best_distance = current_walk_distance
                 best_cluster = None
                 
-                for stop_lat, stop_lon, stop_cluster_id, stop_cluster in all_route_stops:
-                    # Calculate walking distance to this stop
-                    dist = employee.distance_to(stop_lat, stop_lon)
-                    
-                    if dist < best_distance:
-                        best_distance = dist
-                        best_stop = (stop_lat, stop_lon)
-                        best_cluster = stop_cluster
+                dists = haversine_vec(employee.lat, employee.lon, stop_lats, stop_lons)
+                nearest = int(dists.argmin())
+                if dists[nearest] < best_distance:
+                    stop_lat, stop_lon, _, stop_cluster = all_route_stops[nearest]
+                    best_distance = float(dists[nearest])
+                    best_stop = (stop_lat, stop_lon)
+                    best_cluster = stop_cluster
                 
                 # Reassign if a better stop was found on a different cluster
                 if best_stop and best_cluster and best_cluster.id != cluster.id:
@@ -1074,7 +1189,7 @@ class ServicePlanner:
             # Perform reassignments
             for employee, new_cluster, new_stop, new_distance in employees_to_remove:
                 # Remove from old cluster
-                cluster.employees.remove(employee)
+                cluster.remove_employee(employee)
                 
                 # Add to new cluster
                 new_cluster.add_employee(employee)
@@ -1336,9 +1451,10 @@ class ServicePlanner:
             self.clusters = self.cluster_repo.find_all(include_employees=True)
             counts['clusters'] = len(self.clusters)
             
-            # Load routes for each cluster
+            # Load routes for all clusters in one batch
+            routes_by_cluster = self.route_repo.find_by_cluster_ids([c.id for c in self.clusters])
             for cluster in self.clusters:
-                route = self.route_repo.find_by_cluster(cluster.id)
+                route = routes_by_cluster.get(cluster.id)
                 if route:
                     cluster.assign_route(route)
             
@@ -1382,6 +1498,7 @@ class ServicePlanner:
         
         print("[0] Loading Safe Pickup Points...")
         self.safe_stops = self.location_service.get_transit_stops()
+        self.safe_stops_tree = Route.build_stops_tree(self.safe_stops)
         print(f"    OK: {len(self.safe_stops)} stops loaded")
         
         self.generate_employees()
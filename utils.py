@@ -1,17 +1,22 @@
 """
 Utility functions and classes for the route optimization system.
 
-Contains: haversine, DataGenerator, KMeansClusterer
+Contains: haversine, haversine_vec, encode_polyline, get_osm, cached_osm_query, DataGenerator, KMeansClusterer
 """
 from __future__ import annotations
 
+import functools
+import glob
+import hashlib
 import math
+import os
+import tempfile
 
 import numpy as np
 import pandas as pd
-from shapely.geometry import Point
+import shapely
 from pyrosm import OSM
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
 
 
 # =============================================================================
@@ -28,6 +33,89 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
 
 
+def haversine_vec(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine in meters; arguments broadcast like NumPy arrays."""
+    R = 6371000
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+
+def encode_polyline(coordinates: list, precision: int = 5) -> str:
+    """Encode [(lat, lon), ...] as a Google encoded polyline string."""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coordinates:
+        lat_i, lon_i = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return ''.join(chunks)
+
+
+# =============================================================================
+# OSM Access
+# =============================================================================
+
+OSM_CACHE_DIR = "data/cache"
+
+
+@functools.lru_cache(maxsize=None)
+def get_osm(osm_file: str) -> OSM:
+    """Shared pyrosm reader so each PBF file is opened once per process."""
+    return OSM(osm_file)
+
+
+def cached_osm_query(osm_file: str, name: str, custom_filter: dict, **kwargs):
+    """Run a custom-criteria OSM query, caching the result on disk.
+    
+    The cache key covers the filter, the query options and the PBF file's mtime,
+    so warm starts skip parsing the PBF entirely until the file changes.
+    Files are written to a temp file and renamed into place, so concurrent readers
+    never see a partial pickle; an unreadable file is treated as a miss.
+    """
+    digest = hashlib.md5(repr((os.path.abspath(osm_file), sorted(custom_filter.items()),
+                               sorted(kwargs.items()))).encode()).hexdigest()[:12]
+    mtime = int(os.path.getmtime(osm_file))
+    prefix = os.path.join(OSM_CACHE_DIR, f"{name}_{digest}_")
+    cache_path = f"{prefix}{mtime}.pkl"
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception:
+            # Truncated or corrupt (e.g. left by a killed writer); rebuild it
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+    
+    result = get_osm(osm_file).get_data_by_custom_criteria(custom_filter=custom_filter, **kwargs)
+    os.makedirs(OSM_CACHE_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(delete=False, dir=OSM_CACHE_DIR, suffix=".tmp") as tmp:
+        tmp_path = tmp.name
+    try:
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    # Drop caches for earlier versions of the PBF file
+    for stale in glob.glob(glob.escape(prefix) + "*.pkl"):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return result
+
+
 # =============================================================================
 # Data Generator
 # =============================================================================
@@ -37,70 +125,83 @@ class DataGenerator:
     
     def __init__(self, osm_file: str = "data/istanbul-anatolian.osm.pbf") -> None:
         self.osm_file = osm_file
-        self._osm: OSM | None = None
         self._urban_area = None
         self._bounds: tuple | None = None
+        self._transit_stops = None
+        self._transit_stop_arrays: tuple[np.ndarray, list[str]] | None = None
     
     def _load_osm_data(self) -> None:
-        if self._osm is None:
-            self._osm = OSM(self.osm_file)
-            landuse = self._osm.get_data_by_custom_criteria(
+        if self._urban_area is None:
+            landuse = cached_osm_query(
+                self.osm_file, "residential",
                 custom_filter={"landuse": ["residential"]},
                 filter_type="keep", keep_nodes=False, keep_ways=True, keep_relations=True
             )
             self._urban_area = landuse.unary_union
+            # Build GEOS' internal index once for the point-in-polygon tests
+            shapely.prepare(self._urban_area)
             self._bounds = landuse.total_bounds
+    
+    def _query_transit_stops(self):
+        if self._transit_stops is None:
+            self._transit_stops = cached_osm_query(
+                self.osm_file, "transit_stops",
+                custom_filter={
+                    "highway": ["bus_stop"], "amenity": ["bus_station"]
+                },
+                filter_type="keep", keep_nodes=True, keep_ways=False, keep_relations=False
+            )
+        return self._transit_stops
             
+    def get_transit_stop_arrays(self) -> tuple[np.ndarray, list[str]]:
+        """Point stops as an (N, 2) float64 array of (lat, lon) and their names, built once."""
+        if self._transit_stop_arrays is None:
+            stops = self._query_transit_stops()
+            if stops is None or len(stops) == 0:
+                self._transit_stop_arrays = (np.empty((0, 2), dtype=np.float64), [])
+                return self._transit_stop_arrays
+            geoms = stops.geometry.to_numpy()
+            is_point = shapely.get_type_id(geoms) == 0
+            points = geoms[is_point]
+            xy = np.column_stack([shapely.get_y(points), shapely.get_x(points)])
+            if 'name' in stops.columns:
+                # Get name from OSM data, fallback to generic name
+                names = [n if isinstance(n, str) and n else 'Bus Stop' for n in stops['name'].to_numpy()[is_point]]
+            else:
+                names = ['Bus Stop'] * len(points)
+            self._transit_stop_arrays = (xy, names)
+        return self._transit_stop_arrays
+    
     def get_transit_stops(self) -> list[tuple[float, float]]:
-        self._load_osm_data()
-        stops = self._osm.get_data_by_custom_criteria(
-            custom_filter={
-                "highway": ["bus_stop"], "amenity": ["bus_station"]
-            },
-            filter_type="keep", keep_nodes=True, keep_ways=False, keep_relations=False
-        )
-        if stops is None or len(stops) == 0:
-            return []
-        return [(row.geometry.y, row.geometry.x) for _, row in stops.iterrows() 
-                if hasattr(row.geometry, 'y')]
+        xy, _ = self.get_transit_stop_arrays()
+        return list(map(tuple, xy.tolist()))
     
     def get_transit_stops_with_names(self) -> dict[tuple[float, float], str]:
         """Get transit stops with their names as a dict: {(lat, lon): name}"""
-        self._load_osm_data()
-        stops = self._osm.get_data_by_custom_criteria(
-            custom_filter={
-                "highway": ["bus_stop"], "amenity": ["bus_station"]
-            },
-            filter_type="keep", keep_nodes=True, keep_ways=False, keep_relations=False
-        )
-        if stops is None or len(stops) == 0:
-            return {}
-        
-        result = {}
-        for _, row in stops.iterrows():
-            if hasattr(row.geometry, 'y'):
-                lat, lon = row.geometry.y, row.geometry.x
-                # Get name from OSM data, fallback to generic name
-                name = row.get('name', '') if hasattr(row, 'get') else ''
-                if not name and 'name' in row.index:
-                    name = row['name'] if pd.notna(row['name']) else ''
-                result[(lat, lon)] = name or 'Bus Stop'
-        return result
+        xy, names = self.get_transit_stop_arrays()
+        return dict(zip(map(tuple, xy.tolist()), names))
     
     def generate(self, n: int = 100, seed: int = 42) -> pd.DataFrame:
         self._load_osm_data()
         rng = np.random.default_rng(seed)
-        points = []
-        attempts = 0
-        while len(points) < n and attempts < n * 30:
-            lon = rng.uniform(self._bounds[0], self._bounds[2])
-            lat = rng.uniform(self._bounds[1], self._bounds[3])
-            if self._urban_area.contains(Point(lon, lat)):
-                points.append((lat, lon))
-            attempts += 1
+        min_lon, min_lat, max_lon, max_lat = self._bounds
+        lats, lons = [np.empty(0)], [np.empty(0)]
+        accepted = attempts = 0
+        max_attempts = n * 30
+        # Rejection-sample in batches so GEOS tests a whole array per call
+        while accepted < n and attempts < max_attempts:
+            batch = min(max(1024, 4 * (n - accepted)), max_attempts - attempts)
+            lon = rng.uniform(min_lon, max_lon, size=batch)
+            lat = rng.uniform(min_lat, max_lat, size=batch)
+            mask = shapely.contains_xy(self._urban_area, lon, lat)
+            lons.append(lon[mask])
+            lats.append(lat[mask])
+            accepted += int(mask.sum())
+            attempts += batch
+        lat, lon = np.concatenate(lats)[:n], np.concatenate(lons)[:n]
         return pd.DataFrame({
-            "id": np.arange(1, len(points) + 1),
-            "lat": [p[0] for p in points], "lon": [p[1] for p in points]
+            "id": np.arange(1, len(lat) + 1),
+            "lat": lat, "lon": lon
         })
 
 
@@ -108,21 +209,98 @@ class DataGenerator:
 # KMeans Clusterer
 # =============================================================================
 
+def _lloyd_2d(X: np.ndarray, centers: np.ndarray, max_iter: int = 300,
+              tol: float = 1e-4) -> tuple[np.ndarray, np.ndarray, float]:
+    """Lloyd iterations specialised for 2-D points; returns (labels, centers, inertia)."""
+    k = len(centers)
+    x, y = X[:, 0], X[:, 1]
+    xc, yc = x[:, None], y[:, None]
+    # Same convergence criterion as sklearn: tol relative to the mean feature variance
+    tol = tol * float(X.var(axis=0).mean())
+    for _ in range(max_iter):
+        d2 = (xc - centers[:, 0])**2 + (yc - centers[:, 1])**2
+        labels = d2.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # Like sklearn's _relocate_empty_clusters: move the points farthest
+            # from their centers into the empty clusters
+            far = np.argsort(d2[np.arange(len(X)), labels])[::-1][:len(empty)]
+            labels[far] = empty[:len(far)]
+            counts = np.bincount(labels, minlength=k)
+        new_centers = centers.copy()
+        filled = counts > 0  # only possible to miss when K > N
+        new_centers[filled, 0] = np.bincount(labels, weights=x, minlength=k)[filled] / counts[filled]
+        new_centers[filled, 1] = np.bincount(labels, weights=y, minlength=k)[filled] / counts[filled]
+        shift = float(((new_centers - centers)**2).sum())
+        centers = new_centers
+        if shift <= tol:
+            break
+    d2 = (xc - centers[:, 0])**2 + (yc - centers[:, 1])**2
+    labels = d2.argmin(axis=1)
+    return labels, centers, float(d2[np.arange(len(X)), labels].sum())
+
+
 class KMeansClusterer:
-    """KMeans clustering wrapper."""
+    """KMeans clustering wrapper.
     
-    def __init__(self, n_clusters: int = 5, random_state: int | None = 42, n_init: int = 10) -> None:
+    Small 2-D inputs (per-zone and capacity splits) run a NumPy Lloyd seeded
+    with k-means++, skipping sklearn's per-call overhead. Larger inputs go to
+    KMeans, and MiniBatchKMeans above MINIBATCH_THRESHOLD points.
+    """
+    
+    LLOYD_2D_THRESHOLD = 2_000
+    MINIBATCH_THRESHOLD = 10_000
+    TOL = 1e-3  # lat/lon centers don't need sklearn's default 1e-4
+    
+    def __init__(self, n_clusters: int = 5, random_state: int | None = 42, n_init: int | str = 'auto',
+                 init: str = 'k-means++') -> None:
         self.n_clusters = n_clusters
         self.random_state = random_state
         self.n_init = n_init
-        self.model: KMeans | None = None
+        self.init = init
+        self.model: KMeans | MiniBatchKMeans | None = None
         self.cluster_centers_: np.ndarray | None = None
         self.labels_: np.ndarray | None = None
         self.inertia_: float | None = None
     
+    def _seed_centers(self, X: np.ndarray) -> np.ndarray:
+        """k-means++ seeds, drawn from a 50*K subsample when N is larger than that."""
+        sample_size = 50 * self.n_clusters
+        if len(X) > sample_size:
+            idx = np.random.default_rng(self.random_state).choice(len(X), size=sample_size, replace=False)
+            X = X[idx]
+        centers, _ = kmeans_plusplus(X, self.n_clusters, random_state=self.random_state)
+        return centers
+    
     def fit(self, coordinates: np.ndarray) -> KMeansClusterer:
-        self.model = KMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init=self.n_init)
+        coordinates = np.asarray(coordinates)
+        if (coordinates.ndim == 2 and coordinates.shape[1] == 2 and self.init == 'k-means++'
+                and len(coordinates) <= self.LLOYD_2D_THRESHOLD):
+            self.model = None
+            X = np.ascontiguousarray(coordinates, dtype=np.float64)
+            seeds = self._seed_centers(X)
+            labels, centers, inertia = _lloyd_2d(X, seeds, tol=self.TOL)
+            # Callers build one Cluster per label index, so every index needs members;
+            # duplicate points can still leave one empty, in which case defer to sklearn
+            counts = np.bincount(labels, minlength=self.n_clusters)
+            if len(counts) == self.n_clusters and counts.min() > 0:
+                self.labels_, self.cluster_centers_, self.inertia_ = labels, centers, inertia
+                return self
+        # float32 halves memory traffic and hits sklearn's faster kernels
+        coordinates = np.ascontiguousarray(coordinates, dtype=np.float32)
+        if len(coordinates) > self.MINIBATCH_THRESHOLD:
+            self.model = MiniBatchKMeans(n_clusters=self.n_clusters, init=self.init, random_state=self.random_state,
+                                         batch_size=2048, n_init=3, max_iter=100)
+        else:
+            init, n_init = self.init, self.n_init
+            if init == 'k-means++' and len(coordinates) > 50 * self.n_clusters:
+                init, n_init = self._seed_centers(coordinates), 1
+            # Elkan's triangle-inequality bounds skip most distance evaluations in 2-D
+            self.model = KMeans(n_clusters=self.n_clusters, init=init, random_state=self.random_state,
+                                n_init=n_init, tol=self.TOL,
+                                algorithm='elkan' if self.n_clusters > 1 else 'lloyd')
         self.labels_ = self.model.fit_predict(coordinates)
-        self.cluster_centers_ = self.model.cluster_centers_
+        self.cluster_centers_ = self.model.cluster_centers_.astype(np.float64)
         self.inertia_ = self.model.inertia_
         return self
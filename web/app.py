@@ -8,31 +8,80 @@ Provides a REST API and web interface for managing:
 - Vehicles
 - Schedules
 """
+import functools
 import os
 import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from dotenv import load_dotenv
+import numpy as np
+import orjson
+from sklearn.neighbors import KDTree
 
 load_dotenv()
 
+from config import Config
 from db.connection import Database
 from db.repositories import (
     ZoneRepository, EmployeeRepository, ClusterRepository,
     RouteRepository, VehicleRepository, TripHistoryRepository
 )
+from models import Route
+from routing import OSRMRouter
+from services import ServicePlanner
+from utils import DataGenerator, encode_polyline
 
 # Path to React SPA build output
 SPA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '..', 'routing-engine-admin', 'dist')
 SPA_DIR = os.path.abspath(SPA_DIR)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify() and request.json backed by orjson; falls back to Flask's encoder for
+    Decimal, dataclasses etc. and to the stdlib parser for input orjson rejects."""
+    
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity literals and >64-bit integers
+            return super().loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option),
+            mimetype=self.mimetype
+        )
+
+
 app = Flask(__name__, static_folder=os.path.join(SPA_DIR, 'assets'), static_url_path='/assets')
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+# Route polylines compress ~10x; keep levels low so encode CPU stays small
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 4096  # small bodies gain little over the framing cost
+Compress(app)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins='*', async_mode='eventlet')
 
@@ -45,42 +94,119 @@ route_repo = RouteRepository(db)
 vehicle_repo = VehicleRepository(db)
 trip_history_repo = TripHistoryRepository(db)
 
+# One router per process so OSRM calls reuse pooled keep-alive connections
+osrm_router = OSRMRouter()
+# Shared so the transit-stop query result is loaded once for both stop caches
+data_gen = DataGenerator()
+
 # Cache for transit stops to avoid reloading OSM data on every request
 _transit_stops_cache: list[tuple[float, float]] | None = None
 _transit_stop_names_cache: dict[tuple[float, float], str] | None = None
+_transit_stops_tree = None  # STRtree over _transit_stops_cache, same order
 _bus_stops_cache: dict[int, list] = {}  # cluster_id -> bus_stops along route
 
+# Bumped by every write endpoint; read caches are only valid for the version they were built at
+_mutation_version = 0
+_mutation_lock = threading.Lock()  # bumps also come from route-recompute worker threads
+STATS_CACHE_TTL = 5  # seconds
+_stats_cache: dict = {'ts': 0.0, 'data': None, 'version': -1}
+# (cluster_id, include_bus_stops, encoding) -> orjson route payload, valid for one (version, epoch)
+_route_json_cache: dict = {'stamp': (-1, -1), 'blobs': {}}
+
+
+def _bump_mutation_version() -> None:
+    global _mutation_version
+    with _mutation_lock:
+        _mutation_version += 1
+
+
+def _route_coverage(employees: list, clusters_with_routes) -> tuple[np.ndarray, np.ndarray]:
+    """Return (excluded, in_routed_cluster) boolean arrays aligned with employees."""
+    n = len(employees)
+    excluded = np.fromiter((bool(e.excluded) for e in employees), dtype=bool, count=n)
+    cluster_ids = np.fromiter((-1 if e.cluster_id is None else e.cluster_id for e in employees),
+                              dtype=np.int64, count=n)
+    routed = np.fromiter(clusters_with_routes, dtype=np.int64, count=len(clusters_with_routes))
+    return excluded, np.isin(cluster_ids, routed)
+
+
+@functools.lru_cache(maxsize=1)
+def _clusters_with_routes_at(version: int, epoch: int) -> frozenset[int]:
+    return frozenset(route_repo.find_cluster_ids_with_routes())
+
+
+def _cache_stamp() -> tuple[int, int]:
+    """(mutation version, TTL epoch) that DB-derived read caches are keyed on.
+    
+    The TTL epoch bounds staleness from writes made outside this process (e.g. main.py).
+    """
+    return _mutation_version, int(time.time() // STATS_CACHE_TTL)
+
+
+def _clusters_with_routes() -> frozenset[int]:
+    """Cluster IDs that have a route, shared until the next write or TTL epoch."""
+    return _clusters_with_routes_at(*_cache_stamp())
+
+
+def _coordinates_payload(key: str, coordinates: list) -> dict:
+    """{key: [[lat, lon], ...]}, or {key_polyline: str} when ?encoding=polyline."""
+    if request.args.get('encoding') == 'polyline':
+        return {f'{key}_polyline': encode_polyline(coordinates) if coordinates else ''}
+    return {key: coordinates}
+
+
+def _cached_route_json(key: tuple, stamp: tuple[int, int], build) -> bytes:
+    """Encoded route payload for key, built at most once per _cache_stamp().
+    
+    stamp is the _cache_stamp() taken before the request touched the DB;
+    blobs built from data older than the cache's stamp are returned but not stored.
+    """
+    if _route_json_cache['stamp'] < stamp:
+        _route_json_cache.update(stamp=stamp, blobs={})
+    blob = _route_json_cache['blobs'].get(key)
+    if blob is None:
+        blob = orjson.dumps(build(), default=app.json.default, option=app.json.option)
+        if _route_json_cache['stamp'] == stamp:
+            _route_json_cache['blobs'][key] = blob
+    return blob
+
 
 def _get_transit_stops_cached() -> list[tuple[float, float]]:
     global _transit_stops_cache
     if _transit_stops_cache is None:
-        from utils import DataGenerator
-        data_gen = DataGenerator()
         _transit_stops_cache = data_gen.get_transit_stops()
     return _transit_stops_cache
 
 
+def _get_transit_stops_tree():
+    global _transit_stops_tree
+    if _transit_stops_tree is None:
+        # Built straight from the stop array; same order as _transit_stops_cache
+        _transit_stops_tree = Route.build_stops_tree(data_gen.get_transit_stop_arrays()[0])
+    return _transit_stops_tree
+
+
 def _get_transit_stop_names_cached() -> dict[tuple[float, float], str]:
     global _transit_stop_names_cache
     if _transit_stop_names_cache is None:
-        from utils import DataGenerator
-        data_gen = DataGenerator()
         _transit_stop_names_cache = data_gen.get_transit_stops_with_names()
     return _transit_stop_names_cache
 
 
 def _warm_caches():
     """Pre-load heavy OSM caches at startup so first request is fast."""
-    import threading
     def _do():
         print("[Cache] Pre-warming transit stops...")
         _get_transit_stops_cached()
+        _get_transit_stops_tree()
         _get_transit_stop_names_cached()
         print(f"[Cache] Ready — {len(_transit_stops_cache or [])} stops, {len(_transit_stop_names_cache or {})} named stops")
     threading.Thread(target=_do, daemon=True).start()
 
 
-_warm_caches()
+# Set PREWARM=0 to skip (e.g. for CLI tools or tests importing the app)
+if os.getenv('PREWARM', '1') == '1':
+    _warm_caches()
 
 
 # =============================================================================
@@ -213,7 +339,6 @@ def api_login():
         return jsonify({'success': False, 'error': 'Invalid role. Use "employee" or "driver".'}), 400
 
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -226,41 +351,39 @@ def api_login():
 def api_stats():
     """Get dashboard statistics."""
     try:
+        if (_stats_cache['version'] == _mutation_version
+                and time.time() - _stats_cache['ts'] < STATS_CACHE_TTL):
+            return jsonify(_stats_cache['data'])
+        version = _mutation_version
+        
         employees = employee_repo.find_all()
-        clusters = cluster_repo.find_all()
+        cluster_count = cluster_repo.count()
         vehicles = vehicle_repo.find_all()
         zones = zone_repo.find_all()
         
-        # Calculate route stats and track which clusters have routes
-        total_distance = 0
-        total_duration = 0
-        route_count = 0
-        clusters_with_routes = set()
-        
-        for cluster in clusters:
-            route = route_repo.find_by_cluster(cluster.id)
-            if route:
-                total_distance += route.distance_km
-                total_duration += route.duration_min
-                route_count += 1
-                clusters_with_routes.add(cluster.id)
+        # Route totals are aggregated in SQL; track which clusters have routes
+        total_distance, total_duration, route_count = route_repo.get_totals()
+        clusters_with_routes = _clusters_with_routes()
         
-        excluded = sum(1 for e in employees if e.excluded)
+        excluded_mask, has_route = _route_coverage(employees, clusters_with_routes)
+        excluded = int(np.count_nonzero(excluded_mask))
         # Unassigned = active employees whose cluster doesn't have a route
-        unassigned = sum(1 for e in employees if not e.excluded and (e.cluster_id is None or e.cluster_id not in clusters_with_routes))
+        unassigned = int(np.count_nonzero(~excluded_mask & ~has_route))
         
-        return jsonify({
+        data = {
             'total_employees': len(employees),
             'active_employees': len(employees) - excluded,
             'excluded_employees': excluded,
             'unassigned_employees': unassigned,
-            'total_clusters': len(clusters),
+            'total_clusters': cluster_count,
             'total_routes': route_count,
             'total_vehicles': len(vehicles),
             'total_zones': len(zones),
             'total_distance_km': round(total_distance, 2),
             'total_duration_min': round(total_duration, 1)
-        })
+        }
+        _stats_cache.update(ts=time.time(), data=data, version=version)
+        return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -268,7 +391,6 @@ def api_stats():
 @app.route('/api/optimization-mode', methods=['GET'])
 def api_get_optimization_mode():
     """Get current optimization mode and available presets."""
-    from config import Config
     return jsonify({
         'current_mode': getattr(Config, 'OPTIMIZATION_MODE', 'balanced'),
         'presets': Config.OPTIMIZATION_PRESETS
@@ -279,9 +401,6 @@ def api_get_optimization_mode():
 def api_generate_routes():
     """Trigger route generation. Accepts optional JSON body: { "mode": "budget"|"balanced"|"employee" }"""
     try:
-        from config import Config
-        from services import ServicePlanner
-        
         # Read optimization mode from request
         mode = None
         if request.is_json and request.json:
@@ -290,22 +409,12 @@ def api_generate_routes():
         # Run route generation with selected mode
         planner = ServicePlanner(Config)
         planner.run(optimization_mode=mode)
+        _bump_mutation_version()
         
         # Return updated stats
         employees = employee_repo.find_all()
-        clusters = cluster_repo.find_all()
         vehicles = vehicle_repo.find_all()
-        
-        total_distance = 0
-        total_duration = 0
-        route_count = 0
-        
-        for cluster in clusters:
-            route = route_repo.find_by_cluster(cluster.id)
-            if route:
-                total_distance += route.distance_km
-                total_duration += route.duration_min
-                route_count += 1
+        total_distance, total_duration, route_count = route_repo.get_totals()
         
         excluded = sum(1 for e in employees if e.excluded)
         
@@ -334,14 +443,7 @@ def api_employees():
     """Get all employees."""
     try:
         employees = employee_repo.find_all()
-        clusters = cluster_repo.find_all()
-        
-        # Find which clusters have routes
-        clusters_with_routes = set()
-        for cluster in clusters:
-            route = route_repo.find_by_cluster(cluster.id)
-            if route:
-                clusters_with_routes.add(cluster.id)
+        _, has_route = _route_coverage(employees, _clusters_with_routes())
         
         return jsonify([{
             'id': e.id,
@@ -353,8 +455,8 @@ def api_employees():
             'excluded': e.excluded,
             'exclusion_reason': e.exclusion_reason,
             'pickup_point': e.pickup_point,
-            'has_route': e.cluster_id is not None and e.cluster_id in clusters_with_routes
-        } for e in employees])
+            'has_route': routed
+        } for e, routed in zip(employees, has_route.tolist())])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -396,6 +498,7 @@ def api_update_employee(id):
             e.exclusion_reason = data['exclusion_reason']
         
         employee_repo.save(e)
+        _bump_mutation_version()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -416,6 +519,7 @@ def api_update_employee_pickup(id):
             return jsonify({'error': 'lat and lon are required'}), 400
 
         employee_repo.update_pickup_point(id, (float(lat), float(lon)))
+        _bump_mutation_version()
         return jsonify({'success': True, 'pickup_point': [float(lat), float(lon)]})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -437,12 +541,11 @@ def api_walking_route():
         if None in (origin_lat, origin_lon, dest_lat, dest_lon):
             return jsonify({'error': 'origin_lat, origin_lon, dest_lat, dest_lon are required'}), 400
         
-        from routing import OSRMRouter
-        router = OSRMRouter()
-        result = router.get_route(
+        # Copy: the shared router's cache hands back its own dict
+        result = dict(osrm_router.get_route(
             [(origin_lat, origin_lon), (dest_lat, dest_lon)],
             profile='foot'
-        )
+        ))
         # Local OSRM only has driving data, so override duration
         # with walking speed estimate (~5 km/h = 12 min/km)
         result['duration_min'] = round(result['distance_km'] * 12, 1)
@@ -459,10 +562,10 @@ def api_walking_route():
 def api_clusters():
     """Get all clusters."""
     try:
-        clusters = cluster_repo.find_all(include_employees=True)
+        clusters = cluster_repo.find_all(include_employees=True, include_routes=True)
         result = []
         for c in clusters:
-            route = route_repo.find_by_cluster(c.id)
+            route = c.route
             result.append({
                 'id': c.id,
                 'center': c.center,
@@ -472,13 +575,22 @@ def api_clusters():
                 'route_distance': route.distance_km if route else 0,
                 'route_duration': route.duration_min if route else 0,
                 'route_stops': route.stops if route else [],
-                'route_coordinates': route.coordinates if route else []
+                **_coordinates_payload('route_coordinates', route.coordinates if route else [])
             })
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Walking distance per (employee, pickup) pair at ~1m precision; positions rarely change
+_walking_distance_cache: dict[tuple[float, float, float, float], float] = {}
+WALKING_CACHE_MAX = 100_000
+
+
+def _walk_key(e) -> tuple[float, float, float, float]:
+    return (round(e.lat, 5), round(e.lon, 5), round(e.pickup_point[0], 5), round(e.pickup_point[1], 5))
+
+
 @app.route('/api/clusters/<int:id>')
 def api_cluster(id):
     """Get single cluster with employees and route."""
@@ -495,19 +607,23 @@ def api_cluster(id):
         
         if include_walking:
             employees_with_pickup = [e for e in c.employees if e.pickup_point]
-            if employees_with_pickup:
+            keys = {e.id: _walk_key(e) for e in employees_with_pickup}
+            misses = [e for e in employees_with_pickup if keys[e.id] not in _walking_distance_cache]
+            if misses:
                 try:
-                    from routing import OSRMRouter
-                    router = OSRMRouter()
-                    emp_locs = [(e.lat, e.lon) for e in employees_with_pickup]
-                    pickup_locs = [e.pickup_point for e in employees_with_pickup]
-                    distances = router.get_distance_matrix(emp_locs, pickup_locs, profile='foot')
+                    emp_locs = [(e.lat, e.lon) for e in misses]
+                    pickup_locs = [e.pickup_point for e in misses]
+                    distances = osrm_router.get_pairwise_distances(emp_locs, pickup_locs, profile='foot')
                     if distances:
-                        for i, emp in enumerate(employees_with_pickup):
-                            if distances[i] and len(distances[i]) > i:
-                                walking_distances[emp.id] = distances[i][i]
+                        if len(_walking_distance_cache) > WALKING_CACHE_MAX:
+                            _walking_distance_cache.clear()
+                        for emp, dist in zip(misses, distances):
+                            if dist is not None:
+                                _walking_distance_cache[keys[emp.id]] = dist
                 except Exception as e:
                     print(f"Error calculating walking distances: {e}")
+            for emp in employees_with_pickup:
+                walking_distances[emp.id] = _walking_distance_cache.get(keys[emp.id])
         
         return jsonify({
             'id': c.id,
@@ -532,44 +648,62 @@ def api_cluster(id):
         return jsonify({'error': str(e)}), 500
 
 
+def _route_payload(c, route, bus_stops: list, employee_count: int) -> dict:
+    return {
+        'cluster_id': c.id,
+        'center': c.center,
+        'distance_km': route.distance_km,
+        'duration_min': route.duration_min,
+        'stops': route.stops,
+        'bus_stops': bus_stops,
+        **_coordinates_payload('coordinates', route.coordinates),
+        'stop_count': len(route.stops),
+        'bus_stop_count': len(bus_stops),
+        'employee_count': employee_count,
+        'optimized': route.optimized
+    }
+
+
+def _route_bus_stops(cluster_id: int, route) -> list:
+    """Bus stops along a route, cached per cluster until the route is edited."""
+    if cluster_id not in _bus_stops_cache:
+        discovery_buffer = getattr(Config, 'BUS_STOP_DISCOVERY_BUFFER_METERS', 150)
+        same_side = getattr(Config, 'FILTER_STOPS_BY_ROUTE_SIDE', True)
+        _bus_stops_cache[cluster_id] = route.find_all_stops_along_route(
+            _get_transit_stops_cached(), buffer_meters=discovery_buffer, same_side_only=same_side,
+            stops_tree=_get_transit_stops_tree())
+    return _bus_stops_cache[cluster_id]
+
+
 @app.route('/api/routes')
 def api_routes():
-    """Get all routes with cluster info."""
+    """Get all routes with cluster info.
+    
+    ?format=ndjson streams one route object per line instead of a single array.
+    """
     try:
+        stamp = _cache_stamp()
         include_bus_stops = request.args.get('include_bus_stops', 'false').lower() == 'true'
-        clusters = cluster_repo.find_all(include_employees=False)
-        all_transit_stops = _get_transit_stops_cached() if include_bus_stops else []
+        encoding = request.args.get('encoding')
+        clusters = cluster_repo.find_all(include_employees=False, include_routes=True)
         
-        routes = []
-        for c in clusters:
-            route = route_repo.find_by_cluster(c.id)
-            if route:
-                bus_stops = []
-                if include_bus_stops:
-                    if c.id in _bus_stops_cache:
-                        bus_stops = _bus_stops_cache[c.id]
-                    else:
-                        from config import Config
-                        discovery_buffer = getattr(Config, 'BUS_STOP_DISCOVERY_BUFFER_METERS', 150)
-                        same_side = getattr(Config, 'FILTER_STOPS_BY_ROUTE_SIDE', True)
-                        bus_stops = route.find_all_stops_along_route(all_transit_stops, buffer_meters=discovery_buffer, same_side_only=same_side)
-                        _bus_stops_cache[c.id] = bus_stops
-                employee_count = employee_repo.count_by_cluster(c.id)
-                
-                routes.append({
-                    'cluster_id': c.id,
-                    'center': c.center,
-                    'distance_km': route.distance_km,
-                    'duration_min': route.duration_min,
-                    'stops': route.stops,
-                    'bus_stops': bus_stops,
-                    'coordinates': route.coordinates,
-                    'stop_count': len(route.stops),
-                    'bus_stop_count': len(bus_stops),
-                    'employee_count': employee_count,
-                    'optimized': route.optimized
-                })
-        return jsonify(routes)
+        employee_counts = employee_repo.count_by_cluster_ids([c.id for c in clusters if c.route])
+        
+        def build(c):
+            bus_stops = _route_bus_stops(c.id, c.route) if include_bus_stops else []
+            return _route_payload(c, c.route, bus_stops, employee_counts.get(c.id, 0))
+        
+        def iter_blobs():
+            for c in clusters:
+                if c.route:
+                    yield _cached_route_json((c.id, include_bus_stops, encoding), stamp, lambda: build(c))
+        
+        if request.args.get('format') == 'ndjson':
+            def ndjson():
+                for blob in iter_blobs():
+                    yield blob + b'\n'
+            return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+        return Response(b'[' + b','.join(iter_blobs()) + b']', mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -578,6 +712,7 @@ def api_routes():
 def api_get_route(cluster_id):
     """Get a single route with full details including bus stops."""
     try:
+        stamp = _cache_stamp()
         cluster = cluster_repo.find_by_id(cluster_id, include_employees=False)
         if not cluster:
             return jsonify({'error': 'Cluster not found'}), 404
@@ -586,41 +721,81 @@ def api_get_route(cluster_id):
         if not route:
             return jsonify({'error': 'Route not found'}), 404
         
-        # Use cached bus stops if available, otherwise compute and cache
-        if cluster_id in _bus_stops_cache:
-            bus_stops = _bus_stops_cache[cluster_id]
-        else:
-            from config import Config
-            all_transit_stops = _get_transit_stops_cached()
-            discovery_buffer = getattr(Config, 'BUS_STOP_DISCOVERY_BUFFER_METERS', 150)
-            same_side = getattr(Config, 'FILTER_STOPS_BY_ROUTE_SIDE', True)
-            bus_stops = route.find_all_stops_along_route(all_transit_stops, buffer_meters=discovery_buffer, same_side_only=same_side)
-            _bus_stops_cache[cluster_id] = bus_stops
-        
-        employee_count = employee_repo.count_by_cluster(cluster_id)
+        def build():
+            bus_stops = _route_bus_stops(cluster_id, route)
+            return _route_payload(cluster, route, bus_stops, employee_repo.count_by_cluster(cluster_id))
         
-        return jsonify({
-            'cluster_id': cluster.id,
-            'center': cluster.center,
-            'distance_km': route.distance_km,
-            'duration_min': route.duration_min,
-            'stops': route.stops,
-            'bus_stops': bus_stops,
-            'coordinates': route.coordinates,
-            'stop_count': len(route.stops),
-            'bus_stop_count': len(bus_stops),
-            'employee_count': employee_count,
-            'optimized': route.optimized
-        })
+        # Same key as /api/routes?include_bus_stops=true, so both endpoints share blobs
+        blob = _cached_route_json((cluster_id, True, request.args.get('encoding')), stamp, build)
+        return Response(blob, mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Pickup re-matching after a route edit, run off the request thread for ?async=true
+_recompute_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='route-recompute')
+_recompute_tasks: dict[str, Future] = {}
+_recompute_tasks_lock = threading.Lock()  # guards prune-and-insert across request threads
+RECOMPUTE_TASKS_MAX = 1000
+
+
+def _rematch_route_employees(cluster_id: int, route) -> dict:
+    """Find bus stops along an edited route and move the cluster's pickups onto them."""
+    # Get cluster with employees
+    cluster = cluster_repo.find_by_id(cluster_id, include_employees=True)
+    
+    # Reassign employees to nearest stops on the modified route
+    matched_count = 0
+    bus_stops = []
+    if cluster and cluster.employees and route.coordinates:
+        # Load transit stops (bus stops) for proper matching
+        safe_stops = _get_transit_stops_cached()
+        
+        # Find all bus stops along the new route
+        discovery_buffer = getattr(Config, 'BUS_STOP_DISCOVERY_BUFFER_METERS', 150)
+        same_side = getattr(Config, 'FILTER_STOPS_BY_ROUTE_SIDE', True)
+        bus_stops = route.find_all_stops_along_route(safe_stops, buffer_meters=discovery_buffer, same_side_only=same_side,
+                                                     stops_tree=_get_transit_stops_tree())
+        
+        stop_buffer = getattr(Config, 'ROUTE_STOP_BUFFER_METERS', 150)
+        matched_count = route.match_employees_to_route(
+            cluster.employees,
+            safe_stops,
+            buffer_meters=stop_buffer,
+            stops_tree=_get_transit_stops_tree(),
+            router=osrm_router,
+        )
+        
+        # Update employee pickup points in database
+        if matched_count > 0:
+            employee_repo.bulk_update_pickup_points(
+                [(emp.id, emp.pickup_point) for emp in cluster.employees if emp.pickup_point]
+            )
+    
+    return {
+        'employees_reassigned': matched_count,
+        'bus_stops': bus_stops,
+        'bus_stop_count': len(bus_stops)
+    }
+
+
+def _rematch_in_background(cluster_id: int, route) -> dict:
+    try:
+        return _rematch_route_employees(cluster_id, route)
+    finally:
+        _bump_mutation_version()
+
+
 @app.route('/api/routes/<int:cluster_id>', methods=['PUT'])
 def api_update_route(cluster_id):
-    """Update route stops for a cluster and reassign employee pickup points."""
+    """Update route stops for a cluster and reassign employee pickup points.
+    
+    With ?async=true only the route is saved inline; pickup re-matching runs in
+    the background and the response is 202 with a status_url to poll.
+    """
     try:
-        # Invalidate bus_stops cache for this route
+        # Invalidate bus_stops cache for this route; cached route JSON is
+        # dropped by the _bump_mutation_version() below
         _bus_stops_cache.pop(cluster_id, None)
         
         route = route_repo.find_by_cluster(cluster_id)
@@ -628,11 +803,13 @@ def api_update_route(cluster_id):
             return jsonify({'error': 'Route not found'}), 404
         
         data = request.json
+        # Parse and coerce to float in one C pass; shape errors surface as 500s like before
         if 'stops' in data:
-            route.stops = [tuple(s) for s in data['stops']]
+            stops = np.asarray(data['stops'], dtype=np.float64).reshape(-1, 2)
+            route.stops = list(map(tuple, stops.tolist()))
         
         if 'coordinates' in data and data['coordinates']:
-            route.coordinates = [list(c) for c in data['coordinates']]
+            route.coordinates = np.asarray(data['coordinates'], dtype=np.float64).reshape(-1, 2).tolist()
         
         if 'distance_km' in data:
             route.distance_km = data['distance_km']
@@ -642,53 +819,48 @@ def api_update_route(cluster_id):
         
         # Mark as modified (not optimized)
         route.optimized = False
-            
-        # Get cluster with employees
-        cluster = cluster_repo.find_by_id(cluster_id, include_employees=True)
         vehicle_id = None
         
-        # Reassign employees to nearest stops on the modified route
-        matched_count = 0
-        bus_stops = []
-        if cluster and cluster.employees and route.coordinates:
-            # Load transit stops (bus stops) for proper matching
-            from utils import DataGenerator
-            data_gen = DataGenerator()
-            safe_stops = data_gen.get_transit_stops()
-            from config import Config
-            
-            # Find all bus stops along the new route
-            discovery_buffer = getattr(Config, 'BUS_STOP_DISCOVERY_BUFFER_METERS', 150)
-            same_side = getattr(Config, 'FILTER_STOPS_BY_ROUTE_SIDE', True)
-            bus_stops = route.find_all_stops_along_route(safe_stops, buffer_meters=discovery_buffer, same_side_only=same_side)
-            
-            stop_buffer = getattr(Config, 'ROUTE_STOP_BUFFER_METERS', 150)
-            matched_count = route.match_employees_to_route(
-                cluster.employees,
-                safe_stops,
-                buffer_meters=stop_buffer,
-            )
-            
-            # Update employee pickup points in database
-            if matched_count > 0:
-                for emp in cluster.employees:
-                    if emp.pickup_point:
-                        employee_repo.update_pickup_point(emp.id, emp.pickup_point)
+        if request.args.get('async', 'false').lower() == 'true':
+            route_repo.save(route, cluster_id, vehicle_id)
+            _bump_mutation_version()
+            task_id = uuid.uuid4().hex
+            with _recompute_tasks_lock:
+                if len(_recompute_tasks) >= RECOMPUTE_TASKS_MAX:
+                    for done_id in [t for t, f in _recompute_tasks.items() if f.done()]:
+                        del _recompute_tasks[done_id]
+                _recompute_tasks[task_id] = _recompute_executor.submit(_rematch_in_background, cluster_id, route)
+            return jsonify({
+                'success': True,
+                'status': 'pending',
+                'task_id': task_id,
+                'status_url': f'/api/routes/tasks/{task_id}'
+            }), 202
         
+        result = _rematch_route_employees(cluster_id, route)
         route_repo.save(route, cluster_id, vehicle_id)
+        _bump_mutation_version()
             
-        return jsonify({
-            'success': True, 
-            'employees_reassigned': matched_count,
-            'bus_stops': bus_stops,
-            'bus_stop_count': len(bus_stops)
-        })
+        return jsonify({'success': True, **result})
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/routes/tasks/<task_id>')
+def api_route_task(task_id):
+    """Status of a background pickup re-matching started by PUT /api/routes/<id>?async=true."""
+    future = _recompute_tasks.get(task_id)
+    if future is None:
+        return jsonify({'error': 'Task not found'}), 404
+    if not future.done():
+        return jsonify({'status': 'pending', 'task_id': task_id}), 202
+    error = future.exception()
+    if error is not None:
+        return jsonify({'status': 'failed', 'task_id': task_id, 'error': str(error)}), 500
+    return jsonify({'status': 'done', 'task_id': task_id, 'success': True, **future.result()})
+
+
 # =============================================================================
 # REST API - Vehicles
 # =============================================================================
@@ -742,6 +914,7 @@ def api_update_vehicle(id):
             v.capacity = data['capacity']
         
         vehicle_repo.save(v)
+        _bump_mutation_version()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -751,55 +924,59 @@ def api_update_vehicle(id):
 # REST API - Bus Stop Names
 # =============================================================================
 
-# Cache for transit stop names (separate from coordinates cache)
-_transit_stop_names_cache: dict[tuple[float, float], str] | None = None
+# Nearest-stop index over the named stops, built once from _transit_stop_names_cache.
+# Stops are projected to local east/north meters so the tree radius is a real distance.
+_stop_names_index: tuple[KDTree | None, list[str], tuple[float, float]] | None = None
+STOP_NAME_MAX_DIST_M = 50.0
+
+
+def _to_local_meters(latlon: np.ndarray, origin: tuple[float, float]) -> np.ndarray:
+    lat0, lon0 = origin
+    return np.column_stack([
+        (latlon[:, 1] - lon0) * np.cos(np.radians(lat0)) * 111_320.0,
+        (latlon[:, 0] - lat0) * 110_540.0,
+    ])
+
+
+def _get_stop_names_index() -> tuple[KDTree | None, list[str], tuple[float, float]]:
+    """(tree, names, origin); tree is None when there are no named stops (KDTree rejects empty input)."""
+    global _stop_names_index
+    if _stop_names_index is None:
+        names_cache = _get_transit_stop_names_cached()
+        names = list(names_cache.values())
+        coords = np.asarray(list(names_cache.keys()), dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 0:
+            _stop_names_index = (None, names, (0.0, 0.0))
+        else:
+            origin = (float(coords[:, 0].mean()), float(coords[:, 1].mean()))
+            _stop_names_index = (KDTree(_to_local_meters(coords, origin)), names, origin)
+    return _stop_names_index
+
 
 @app.route('/api/stops/names', methods=['POST'])
 def api_stop_names():
     """Look up bus stop names by coordinates."""
     try:
-        names_cache = _get_transit_stop_names_cached()
-        
         data = request.json
         coordinates = data.get('coordinates', [])  # List of [lat, lon] pairs
         
-        # Build a lookup dict rounded to 4 decimal places (~11m precision)
-        # for fast O(1) matching instead of brute-force iteration
-        if not hasattr(api_stop_names, '_grid'):
-            grid: dict[tuple[int, int], tuple[float, str]] = {}
-            for (stop_lat, stop_lon), name in names_cache.items():
-                # Round to 4 decimals (~11m grid cells)
-                key = (round(stop_lat, 4), round(stop_lon, 4))
-                grid[key] = (abs(stop_lat) + abs(stop_lon), name)
-            api_stop_names._grid = grid
-        
-        grid = api_stop_names._grid
         results = {}
-        for coord in coordinates:
-            lat, lon = coord[0], coord[1]
-            key = f"{lat:.5f},{lon:.5f}"
-            # Check 3x3 neighborhood of grid cells for nearest match
-            best_name = None
-            best_dist = 0.0005  # ~50m threshold
-            rlat, rlon = round(lat, 4), round(lon, 4)
-            for dlat in (-0.0001, 0, 0.0001):
-                for dlon in (-0.0001, 0, 0.0001):
-                    gkey = (round(rlat + dlat, 4), round(rlon + dlon, 4))
-                    if gkey in grid:
-                        slat_slon_sum, name = grid[gkey]
-                        # Approximate distance using the original coords from cache
-                        for (slat, slon), sname in names_cache.items():
-                            if round(slat, 4) == gkey[0] and round(slon, 4) == gkey[1]:
-                                dist = abs(slat - lat) + abs(slon - lon)
-                                if dist < best_dist:
-                                    best_dist = dist
-                                    best_name = sname
-                                break
-            results[key] = best_name or 'Bus Stop'
+        if not coordinates:
+            return jsonify(results)
+        
+        tree, names, origin = _get_stop_names_index()
+        query = np.asarray(coordinates, dtype=np.float64)[:, :2]
+        if tree is not None:
+            dist, idx = tree.query(_to_local_meters(query, origin), k=1)
+            dist, idx = dist[:, 0].tolist(), idx[:, 0].tolist()
+        else:
+            dist, idx = [np.inf] * len(query), [0] * len(query)
+        for (lat, lon), d, i in zip(query.tolist(), dist, idx):
+            name = names[i] if d < STOP_NAME_MAX_DIST_M else None
+            results[f"{lat:.5f},{lon:.5f}"] = name or 'Bus Stop'
         
         return jsonify(results)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
@@ -808,174 +985,186 @@ def api_stop_names():
 # REST API - Cost Report
 # =============================================================================
 
+# (query param, default) in _cost_report's parameter order
+COST_REPORT_PARAMS = (
+    ('driver_salary', 35000),       # ₺/month
+    ('sgk_rate', 22.5),             # %
+    ('unemployment_rate', 2),       # %
+    ('vehicle_rent', 25000),        # ₺/month per vehicle
+    ('fuel_price', 43.5),           # ₺/liter
+    ('fuel_consumption', 15),       # liters/100km
+    ('maintenance', 8000),          # ₺/month per vehicle
+    ('mtv', 1500),                  # ₺/month per vehicle
+    ('working_days', 22),           # days/month
+    ('trips_per_day', 2),           # round-trip (morning+evening)
+    ('overhead_rate', 5),           # %
+    ('profit_rate', 10),            # %
+    ('kdv_rate', 20),               # %
+    ('stamp_tax_rate', 0.948),      # %
+    ('contract_months', 12),        # months
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _cost_report(system: tuple, params: tuple) -> dict:
+    """Cost report for (total_employees, active_employees, total_distance, total_duration,
+    route_count, vehicle_count) under the COST_REPORT_PARAMS values in params.
+    
+    Pure in its arguments, so repeat previews with the same inputs are cache hits.
+    Callers must not mutate the returned dict.
+    """
+    total_employees, active_employees, total_distance, total_duration, route_count, vehicle_count = system
+    (driver_gross_salary, sgk_rate, unemployment_rate, vehicle_rent, fuel_price_per_liter,
+     fuel_consumption, maintenance_monthly, mtv_monthly, working_days, trips_per_day,
+     overhead_rate, profit_rate, kdv_rate, stamp_tax_rate, contract_months) = params
+    sgk_employer_rate = sgk_rate / 100
+    unemployment_rate = unemployment_rate / 100
+    overhead_rate = overhead_rate / 100
+    profit_rate = profit_rate / 100
+    kdv_rate = kdv_rate / 100
+    stamp_tax_rate = stamp_tax_rate / 100
+    
+    # === Calculations ===
+    
+    # 1. Driver costs (per vehicle, monthly)
+    sgk_cost = driver_gross_salary * sgk_employer_rate
+    unemployment_cost = driver_gross_salary * unemployment_rate
+    driver_total_per_vehicle = driver_gross_salary + sgk_cost + unemployment_cost
+    driver_total = driver_total_per_vehicle * vehicle_count
+    
+    # 2. Vehicle costs (monthly, all vehicles)
+    vehicle_rent_total = vehicle_rent * vehicle_count
+    maintenance_total = maintenance_monthly * vehicle_count
+    mtv_total = mtv_monthly * vehicle_count
+    vehicle_total = vehicle_rent_total + maintenance_total + mtv_total
+    
+    # 3. Fuel costs (monthly, all routes)
+    daily_km = total_distance * trips_per_day
+    monthly_km = daily_km * working_days
+    fuel_liters_monthly = monthly_km * fuel_consumption / 100
+    fuel_total = fuel_liters_monthly * fuel_price_per_liter
+    
+    # 4. Subtotal (before overhead/profit/taxes)
+    subtotal = driver_total + vehicle_total + fuel_total
+    
+    # 5. Overhead
+    overhead_total = subtotal * overhead_rate
+    
+    # 6. Net operational cost
+    net_cost = subtotal + overhead_total
+    
+    # 7. Profit margin
+    profit_total = net_cost * profit_rate
+    
+    # 8. Pre-tax total
+    pre_tax_total = net_cost + profit_total
+    
+    # 9. KDV
+    kdv_total = pre_tax_total * kdv_rate
+    
+    # 10. Grand total (monthly tender price)
+    grand_total_monthly = pre_tax_total + kdv_total
+    
+    # 11. Stamp tax (on contract value)
+    contract_value = grand_total_monthly * contract_months
+    stamp_tax = contract_value * stamp_tax_rate
+    
+    # 12. Final contract value
+    final_contract = contract_value + stamp_tax
+    
+    return {
+        # System data
+        'system': {
+            'total_employees': total_employees,
+            'active_employees': active_employees,
+            'vehicle_count': vehicle_count,
+            'route_count': route_count,
+            'total_distance_km': round(total_distance, 2),
+            'total_duration_min': round(total_duration, 1),
+            'daily_km': round(daily_km, 2),
+            'monthly_km': round(monthly_km, 2),
+        },
+        # Parameters used
+        'params': {
+            'driver_salary': driver_gross_salary,
+            'sgk_rate': round(sgk_employer_rate * 100, 2),
+            'unemployment_rate': round(unemployment_rate * 100, 2),
+            'vehicle_rent': vehicle_rent,
+            'fuel_price': fuel_price_per_liter,
+            'fuel_consumption': fuel_consumption,
+            'maintenance': maintenance_monthly,
+            'mtv': mtv_monthly,
+            'working_days': working_days,
+            'trips_per_day': trips_per_day,
+            'overhead_rate': round(overhead_rate * 100, 2),
+            'profit_rate': round(profit_rate * 100, 2),
+            'kdv_rate': round(kdv_rate * 100, 2),
+            'stamp_tax_rate': round(stamp_tax_rate * 100, 3),
+            'contract_months': contract_months,
+        },
+        # Cost breakdown (monthly)
+        'breakdown': {
+            'driver': {
+                'gross_salary': round(driver_gross_salary, 2),
+                'sgk_per_driver': round(sgk_cost, 2),
+                'unemployment_per_driver': round(unemployment_cost, 2),
+                'total_per_driver': round(driver_total_per_vehicle, 2),
+                'total': round(driver_total, 2),
+            },
+            'vehicle': {
+                'rent_per_vehicle': round(vehicle_rent, 2),
+                'rent_total': round(vehicle_rent_total, 2),
+                'maintenance_per_vehicle': round(maintenance_monthly, 2),
+                'maintenance_total': round(maintenance_total, 2),
+                'mtv_per_vehicle': round(mtv_monthly, 2),
+                'mtv_total': round(mtv_total, 2),
+                'total': round(vehicle_total, 2),
+            },
+            'fuel': {
+                'liters_monthly': round(fuel_liters_monthly, 2),
+                'total': round(fuel_total, 2),
+            },
+            'subtotal': round(subtotal, 2),
+            'overhead': round(overhead_total, 2),
+            'net_cost': round(net_cost, 2),
+            'profit': round(profit_total, 2),
+            'pre_tax_total': round(pre_tax_total, 2),
+            'kdv': round(kdv_total, 2),
+            'grand_total_monthly': round(grand_total_monthly, 2),
+        },
+        # Contract summary
+        'contract': {
+            'months': int(contract_months),
+            'monthly_total': round(grand_total_monthly, 2),
+            'contract_value': round(contract_value, 2),
+            'stamp_tax': round(stamp_tax, 2),
+            'final_total': round(final_contract, 2),
+            'per_employee_monthly': round(grand_total_monthly / active_employees, 2) if active_employees else 0,
+            'per_vehicle_monthly': round(grand_total_monthly / vehicle_count, 2) if vehicle_count else 0,
+            'per_km': round(grand_total_monthly / monthly_km, 2) if monthly_km else 0,
+        }
+    }
+
+
 @app.route('/api/cost-report')
 def api_cost_report():
     """Calculate comprehensive cost report including Turkish taxes."""
     try:
-        from config import Config
-        
-        # Fetch real data from database
-        employees = employee_repo.find_all()
-        clusters = cluster_repo.find_all()
-        vehicles = vehicle_repo.find_all()
-        
-        total_distance = 0.0
-        total_duration = 0.0
-        route_count = 0
-        for cluster in clusters:
-            route = route_repo.find_by_cluster(cluster.id)
-            if route:
-                total_distance += float(route.distance_km)
-                total_duration += float(route.duration_min)
-                route_count += 1
-        
-        active_employees = sum(1 for e in employees if not e.excluded)
-        vehicle_count = len(vehicles) if vehicles else route_count
+        # Aggregate real data in the database
+        total_employees = employee_repo.count()
+        active_employees = employee_repo.count_active()
+        total_distance, total_duration, route_count = route_repo.get_totals()
+        vehicle_count = vehicle_repo.count() or route_count
         
         # Override defaults with query parameters
         def qp(name, default):
             val = request.args.get(name)
             return float(val) if val is not None else default
         
-        # === Cost Parameters (overridable) ===
-        driver_gross_salary   = qp('driver_salary', 35000)       # ₺/month
-        sgk_employer_rate     = qp('sgk_rate', 22.5) / 100       # 22.5%
-        unemployment_rate     = qp('unemployment_rate', 2) / 100  # 2%
-        vehicle_rent          = qp('vehicle_rent', 25000)         # ₺/month per vehicle
-        fuel_price_per_liter  = qp('fuel_price', 43.5)            # ₺/liter
-        fuel_consumption      = qp('fuel_consumption', 15)        # liters/100km
-        maintenance_monthly   = qp('maintenance', 8000)           # ₺/month per vehicle
-        mtv_monthly           = qp('mtv', 1500)                   # ₺/month per vehicle
-        working_days          = qp('working_days', 22)            # days/month
-        trips_per_day         = qp('trips_per_day', 2)            # round-trip (morning+evening)
-        overhead_rate         = qp('overhead_rate', 5) / 100      # 5%
-        profit_rate           = qp('profit_rate', 10) / 100       # 10%
-        kdv_rate              = qp('kdv_rate', 20) / 100          # 20%
-        stamp_tax_rate        = qp('stamp_tax_rate', 0.948) / 100 # 0.948%
-        contract_months       = qp('contract_months', 12)         # months
-        
-        # === Calculations ===
-        
-        # 1. Driver costs (per vehicle, monthly)
-        sgk_cost = driver_gross_salary * sgk_employer_rate
-        unemployment_cost = driver_gross_salary * unemployment_rate
-        driver_total_per_vehicle = driver_gross_salary + sgk_cost + unemployment_cost
-        driver_total = driver_total_per_vehicle * vehicle_count
-        
-        # 2. Vehicle costs (monthly, all vehicles)
-        vehicle_rent_total = vehicle_rent * vehicle_count
-        maintenance_total = maintenance_monthly * vehicle_count
-        mtv_total = mtv_monthly * vehicle_count
-        vehicle_total = vehicle_rent_total + maintenance_total + mtv_total
-        
-        # 3. Fuel costs (monthly, all routes)
-        daily_km = total_distance * trips_per_day
-        monthly_km = daily_km * working_days
-        fuel_liters_monthly = monthly_km * fuel_consumption / 100
-        fuel_total = fuel_liters_monthly * fuel_price_per_liter
-        
-        # 4. Subtotal (before overhead/profit/taxes)
-        subtotal = driver_total + vehicle_total + fuel_total
-        
-        # 5. Overhead
-        overhead_total = subtotal * overhead_rate
-        
-        # 6. Net operational cost
-        net_cost = subtotal + overhead_total
-        
-        # 7. Profit margin
-        profit_total = net_cost * profit_rate
-        
-        # 8. Pre-tax total
-        pre_tax_total = net_cost + profit_total
-        
-        # 9. KDV
-        kdv_total = pre_tax_total * kdv_rate
-        
-        # 10. Grand total (monthly tender price)
-        grand_total_monthly = pre_tax_total + kdv_total
-        
-        # 11. Stamp tax (on contract value)
-        contract_value = grand_total_monthly * contract_months
-        stamp_tax = contract_value * stamp_tax_rate
-        
-        # 12. Final contract value
-        final_contract = contract_value + stamp_tax
-        
-        return jsonify({
-            # System data
-            'system': {
-                'total_employees': len(employees),
-                'active_employees': active_employees,
-                'vehicle_count': vehicle_count,
-                'route_count': route_count,
-                'total_distance_km': round(total_distance, 2),
-                'total_duration_min': round(total_duration, 1),
-                'daily_km': round(daily_km, 2),
-                'monthly_km': round(monthly_km, 2),
-            },
-            # Parameters used
-            'params': {
-                'driver_salary': driver_gross_salary,
-                'sgk_rate': round(sgk_employer_rate * 100, 2),
-                'unemployment_rate': round(unemployment_rate * 100, 2),
-                'vehicle_rent': vehicle_rent,
-                'fuel_price': fuel_price_per_liter,
-                'fuel_consumption': fuel_consumption,
-                'maintenance': maintenance_monthly,
-                'mtv': mtv_monthly,
-                'working_days': working_days,
-                'trips_per_day': trips_per_day,
-                'overhead_rate': round(overhead_rate * 100, 2),
-                'profit_rate': round(profit_rate * 100, 2),
-                'kdv_rate': round(kdv_rate * 100, 2),
-                'stamp_tax_rate': round(stamp_tax_rate * 100, 3),
-                'contract_months': contract_months,
-            },
-            # Cost breakdown (monthly)
-            'breakdown': {
-                'driver': {
-                    'gross_salary': round(driver_gross_salary, 2),
-                    'sgk_per_driver': round(sgk_cost, 2),
-                    'unemployment_per_driver': round(unemployment_cost, 2),
-                    'total_per_driver': round(driver_total_per_vehicle, 2),
-                    'total': round(driver_total, 2),
-                },
-                'vehicle': {
-                    'rent_per_vehicle': round(vehicle_rent, 2),
-                    'rent_total': round(vehicle_rent_total, 2),
-                    'maintenance_per_vehicle': round(maintenance_monthly, 2),
-                    'maintenance_total': round(maintenance_total, 2),
-                    'mtv_per_vehicle': round(mtv_monthly, 2),
-                    'mtv_total': round(mtv_total, 2),
-                    'total': round(vehicle_total, 2),
-                },
-                'fuel': {
-                    'liters_monthly': round(fuel_liters_monthly, 2),
-                    'total': round(fuel_total, 2),
-                },
-                'subtotal': round(subtotal, 2),
-                'overhead': round(overhead_total, 2),
-                'net_cost': round(net_cost, 2),
-                'profit': round(profit_total, 2),
-                'pre_tax_total': round(pre_tax_total, 2),
-                'kdv': round(kdv_total, 2),
-                'grand_total_monthly': round(grand_total_monthly, 2),
-            },
-            # Contract summary
-            'contract': {
-                'months': int(contract_months),
-                'monthly_total': round(grand_total_monthly, 2),
-                'contract_value': round(contract_value, 2),
-                'stamp_tax': round(stamp_tax, 2),
-                'final_total': round(final_contract, 2),
-                'per_employee_monthly': round(grand_total_monthly / active_employees, 2) if active_employees else 0,
-                'per_vehicle_monthly': round(grand_total_monthly / vehicle_count, 2) if vehicle_count else 0,
-                'per_km': round(grand_total_monthly / monthly_km, 2) if monthly_km else 0,
-            }
-        })
+        system = (total_employees, active_employees, total_distance, total_duration, route_count, vehicle_count)
+        params = tuple(qp(name, default) for name, default in COST_REPORT_PARAMS)
+        return jsonify(_cost_report(system, params))
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
@@ -1011,7 +1200,6 @@ def save_trip():
         )
         return jsonify({'id': trip_id}), 201
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
@@ -1204,5 +1392,6 @@ if __name__ == '__main__':
     print("  (with real-time Socket.IO tracking)")
     print("="*50)
     print("  Open: http://localhost:5050")
+    print("  Dev server only - for production run web/wsgi.py under gunicorn")
     print("="*50 + "\n")
     socketio.run(app, debug=True, host='0.0.0.0', port=5050)
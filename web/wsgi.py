@@ -0,0 +1,11 @@
+"""
+WSGI entry point for running the dashboard under gunicorn.
+
+Socket.IO needs the eventlet worker, and trip rooms / _active_trips live in
+process memory, so run a single worker:
+
+    gunicorn --chdir web -k eventlet -w 1 -b 0.0.0.0:5050 wsgi:application
+"""
+from app import app
+
+application = app